@@ -4,13 +4,64 @@ import pandas as pd
 import os # Import os if needed elsewhere, though not strictly required by this version
 
 # Update imports to use the new function and base classes/functions
-from src.data_ingestion.ingest import process_uploaded_file, scrape_url # Removed process_file, kept scrape_url
+from src.data_ingestion.ingest import iter_uploaded_documents, scrape_url # Removed process_file, kept scrape_url
 # from src.data_ingestion.ingest import scrape_url_with_selenium # Uncomment if adding Selenium option
+from src.data_ingestion.dedup import TextDeduplicator
 from src.nlp_processing.extractor import EntityRelationExtractor
 from src.graph_construction.builder import KnowledgeGraphBuilder
-from src.visualization.visualizer import prepare_agraph_nodes_edges
+from src.visualization.visualizer import GraphView
 from streamlit_agraph import agraph, Node, Edge, Config # Make sure all imports are correct
 
+def update_graph_view(graph_builder):
+    """Refresh the node/edge tables, agraph objects and metrics in session state from the builder's graph
+
+    Only the nodes/edges changed since the last refresh are recomputed (see GraphView).
+    """
+    view = st.session_state.get('graph_view')
+    if view is None or view.graph_builder is not graph_builder:
+        view = st.session_state['graph_view'] = GraphView(graph_builder)
+    view.refresh()
+
+    # Get data for visualization and metrics
+    st.session_state['node_data'] = list(view.node_rows.values())
+    st.session_state['edge_data'] = list(view.edge_rows.values())
+    st.session_state['predicate_data'] = view.predicate_summary()
+
+    # Prepare nodes and edges for agraph
+    st.session_state['nodes'] = list(view.nodes.values())
+    st.session_state['edges'] = list(view.edges.values())
+
+    # Calculate metrics (density counts entity pairs, not one edge per predicate)
+    st.session_state['graph_metrics'] = {
+         "num_entities": len(st.session_state['nodes']),
+         "num_relations": len(st.session_state['edges']),
+         "density": round(graph_builder.density(), 4)
+    }
+
+def iter_uploaded_texts(uploaded_files, report):
+    """Yield the text of every uploaded document (archives member by member), one at a time
+
+    Nothing is kept besides what goes into report: an error message per failed
+    document, the number of documents read and a preview of the first one.
+    """
+    for uploaded_file in uploaded_files:
+        try:
+            # Archives are streamed member by member; plain documents yield a single entry
+            for document_name, extracted_content, error in iter_uploaded_documents(uploaded_file):
+                if error is not None:
+                    report['errors'].append(f"{document_name}: {error}")
+                elif extracted_content:
+                    report['documents'] += 1
+                    if report['preview'] is None:
+                        report['preview'] = extracted_content[:2000]
+                    yield extracted_content
+                else:
+                    report['errors'].append(f"{document_name}: No text could be extracted.")
+        except Exception as e:
+            # Keep the documents read so far and go on with the next upload
+            print(f"Error while reading uploaded file {uploaded_file.name}: {e}")
+            report['errors'].append(f"{uploaded_file.name}: Error while reading the file: {e}")
+
 def main():
     # تنظیمات صفحه Streamlit
     st.set_page_config(
@@ -35,8 +86,12 @@ def main():
          st.session_state['node_data'] = []
     if 'edge_data' not in st.session_state:
          st.session_state['edge_data'] = []
+    if 'predicate_data' not in st.session_state:
+         st.session_state['predicate_data'] = []
     if 'graph_metrics' not in st.session_state:
         st.session_state['graph_metrics'] = {}
+    if 'graph_builder' not in st.session_state:
+        st.session_state['graph_builder'] = None
 
 
     # Sidebar برای انتخاب منبع داده
@@ -48,16 +103,38 @@ def main():
         key="data_source_option" # Add a key for state management
     )
 
+    # Duplicate headers/footers/pages are removed before NLP so they don't inflate counts
+    dedup_enabled = st.sidebar.checkbox("Skip duplicate paragraphs and documents", True, key="dedup_toggle")
+    dedup_threshold = st.sidebar.slider("Near-Duplicate Similarity Threshold", 0.5, 1.0, 0.85, 0.05,
+                                        key="dedup_threshold", disabled=not dedup_enabled)
+
+    # Speed/accuracy trade-off for entity/relation extraction ("auto" picks one from text size)
+    extraction_profile = st.sidebar.selectbox("Extraction Profile", ["auto", "fast", "balanced", "accurate"],
+                                              index=0, key="extraction_profile")
+    target_latency = st.sidebar.number_input("Target Extraction Time (seconds)", min_value=1.0, value=30.0, step=5.0,
+                                             key="target_latency", disabled=extraction_profile != "auto")
+
+    # View filters are applied to the already built graph, so changing them never re-runs NLP
+    st.sidebar.subheader("View Filters")
+    confidence_threshold = st.sidebar.slider("Relation Confidence Threshold", 0.0, 1.0, 0.5, 0.05, key="confidence_threshold")
+    entity_type_options = st.session_state['graph_builder'].get_entity_types() if st.session_state['graph_builder'] else []
+    entity_types = st.sidebar.multiselect("Entity Types (empty = all)", entity_type_options, key="entity_types_filter")
+    min_count = st.sidebar.number_input("Minimum Entity Count", min_value=1, value=1, step=1, key="min_count_filter")
+    min_weight = st.sidebar.number_input("Minimum Relation Weight", min_value=1, value=1, step=1, key="min_weight_filter")
+
     # --- Data Input Section ---
+    # Each source sets documents (an iterable of texts, read lazily for uploads) and an
+    # estimate of their total size; they are processed below in the same run
+    documents, total_chars, upload_report = None, 0, None
     # Reset state if input method changes or no input is given yet
     # This logic might need refinement depending on desired behavior
     # For now, we process based on button clicks within each section
 
     if upload_option == "Upload Files":
         uploaded_files = st.sidebar.file_uploader(
-            "Upload Documents (.pdf, .txt, .docx)",
+            "Upload Documents (.pdf, .txt, .docx) or archives of them (.zip, .tar, .tar.gz, .jsonl)",
             accept_multiple_files=True,
-            type=["pdf", "txt", "docx"],
+            type=["pdf", "txt", "docx", "zip", "tar", "gz", "tgz", "jsonl"],
             key="file_uploader" # Add key
         )
         if st.sidebar.button("Process Uploaded Files", key="process_files_button", disabled=not uploaded_files):
@@ -65,36 +142,11 @@ def main():
                 st.session_state['text_content'] = None # Reset previous text
                 st.session_state['graph_built'] = False # Reset graph state
                 st.info(f"Processing {len(uploaded_files)} files...")
-                all_texts = []
-                error_messages = []
-                with st.spinner("Extracting text from files..."):
-                    for uploaded_file in uploaded_files:
-                        # Use the new function that handles file objects
-                        extracted_content = process_uploaded_file(uploaded_file)
-                        if extracted_content:
-                            # Check if it's an error message returned by the function
-                            if extracted_content.startswith("Error:"):
-                                error_messages.append(f"{uploaded_file.name}: {extracted_content}")
-                            else:
-                                all_texts.append(extracted_content)
-                        else:
-                            # Handle case where None is returned unexpectedly
-                            error_messages.append(f"{uploaded_file.name}: Failed to extract text (returned None).")
-
-                if error_messages:
-                    for msg in error_messages:
-                        st.warning(msg) # Show warnings for files that failed
-
-                if all_texts:
-                    st.session_state['text_content'] = "\n\n".join(all_texts) # Join texts with a separator
-                    st.success("Text extraction complete for processable files.")
-                    # Optional: Show a preview
-                    with st.expander("Show Extracted Text Preview (First 2000 Chars)"):
-                         st.text_area("", st.session_state['text_content'][:2000], height=200, key="text_preview_files")
-                elif not error_messages:
-                     st.warning("No files were uploaded or selected for processing.")
-                elif not all_texts and error_messages:
-                     st.error("Text extraction failed for all uploaded files.")
+                # Documents are read while they are extracted, so a large archive is never held in memory;
+                # the upload size (bytes) stands in for the not yet known text length
+                upload_report = {'errors': [], 'documents': 0, 'preview': None}
+                documents = iter_uploaded_texts(uploaded_files, upload_report)
+                total_chars = sum(uploaded_file.size for uploaded_file in uploaded_files)
 
 
     elif upload_option == "Enter URL":
@@ -111,8 +163,9 @@ def main():
                     #     st.session_state['text_content'] = scrape_url_with_selenium(url)
                     # else:
                     st.session_state['text_content'] = scrape_url(url)
-
                 if st.session_state['text_content']:
+                    documents = [st.session_state['text_content']]
+                    total_chars = len(st.session_state['text_content'])
                     st.success("Content fetched successfully.")
                     with st.expander("Show Fetched Text Preview (First 2000 Chars)"):
                          st.text_area("", st.session_state['text_content'][:2000], height=200, key="text_preview_url")
@@ -131,6 +184,8 @@ def main():
                 st.info("Processing pasted text...")
                 with st.spinner("Processing..."):
                     st.session_state['text_content'] = text_input # Assign the pasted text
+                    documents = [text_input]
+                    total_chars = len(text_input)
                 st.success("Text processed.")
                 with st.expander("Show Input Text Preview (First 2000 Chars)"):
                          st.text_area("", st.session_state['text_content'][:2000], height=200, key="text_preview_paste")
@@ -139,72 +194,74 @@ def main():
                 st.warning("Please paste text into the text area.")
 
     # --- Processing and Graph Building Section ---
-    # This section runs if text_content was successfully populated by one of the methods above
+    # This section runs if documents were successfully populated by one of the methods above
     # We use session state to avoid reprocessing on every interaction
 
-    if st.session_state['text_content'] and not st.session_state['graph_built']:
+    if documents is not None and not st.session_state['graph_built']:
         st.write("---") # Separator
         st.header("Processing Text and Building Graph")
-        text_to_process = st.session_state['text_content']
-        print(f"Processing text content of length: {len(text_to_process)}") # Debugging print to console
+        print(f"Processing documents, about {total_chars} characters") # Debugging print to console
+
+        if dedup_enabled:
+            # Compare whole uploaded documents (not blank-line blocks, which PDF/DOCX text is full of);
+            # each document is checked against the ones before it as it streams through
+            deduplicator = TextDeduplicator(threshold=dedup_threshold)
+            documents = deduplicator.iter_dedup_documents(documents)
 
         # Initialize components
         try:
-            extractor = EntityRelationExtractor() # Consider adding model loading feedback/error handling
+            extractor = EntityRelationExtractor(profile=extraction_profile, target_latency=target_latency)
             graph_builder = KnowledgeGraphBuilder()
 
-            # Extract entities and relations
-            st.write("Step 1: Extracting Entities...")
-            with st.spinner("Identifying entities..."):
-                 entities = extractor.extract_entities(text_to_process)
-            st.write(f"Found {len(entities)} entities.")
-
-            st.write("Step 2: Extracting Relations...")
-            with st.spinner("Identifying potential relations..."):
-                 relations = extractor.extract_relations(text_to_process)
-            st.write(f"Found {len(relations)} potential relations.")
-
-            if not entities and not relations:
+            # Extract entities and relations in one pass; all documents share one batched nlp.pipe and
+            # each document's results go straight into the builder, so no document is kept around
+            st.write(f"Step 1-2: Extracting Entities and Relations "
+                     f"('{extractor.resolve_profile(total_chars=total_chars)}' profile)...")
+            num_entities = num_relations = 0
+            with st.spinner("Reading documents and identifying entities and potential relations..."):
+                 for document_entities, document_relations in extractor.extract_many(documents, total_chars=total_chars):
+                     graph_builder.add_extraction(document_entities, document_relations)
+                     num_entities += len(document_entities)
+                     num_relations += len(document_relations)
+
+            if upload_report is not None:
+                for msg in upload_report['errors']:
+                    st.warning(msg) # Show warnings for files that failed
+                if upload_report['documents']:
+                    st.success(f"Text extraction complete for {upload_report['documents']} documents.")
+                    # Optional: Show a preview
+                    with st.expander("Show Extracted Text Preview (First Document, First 2000 Chars)"):
+                         st.text_area("", upload_report['preview'], height=200, key="text_preview_files")
+                elif upload_report['errors']:
+                     st.error("Text extraction failed for all uploaded files.")
+            if dedup_enabled:
+                dedup_stats = deduplicator.get_stats()
+                skipped_docs = dedup_stats["documents_skipped_exact"] + dedup_stats["documents_skipped_near"]
+                skipped_paragraphs = dedup_stats["paragraphs_skipped_exact"] + dedup_stats["paragraphs_skipped_near"]
+                st.write(f"Deduplication: skipped {skipped_docs} documents and {skipped_paragraphs} paragraphs "
+                         f"({dedup_stats['saved_ratio']:.1%} of the text).")
+            st.write(f"Found {num_entities} entities.")
+            st.write(f"Found {num_relations} potential relations.")
+
+            if not num_entities and not num_relations:
                 st.warning("No entities or relations could be extracted from the provided text. The graph will be empty.")
                 # Set empty data in session state
                 st.session_state['node_data'] = []
                 st.session_state['edge_data'] = []
+                st.session_state['predicate_data'] = []
                 st.session_state['nodes'] = []
                 st.session_state['edges'] = []
                 st.session_state['graph_metrics'] = {"num_entities": 0, "num_relations": 0, "density": 0.0}
+                st.session_state['graph_builder'] = None
 
             else:
                 st.write("Step 3: Building Knowledge Graph...")
                 with st.spinner("Constructing graph structure..."):
-                    # Add to graph
-                    graph_builder.add_entities(entities)
-                    # You might want to make the confidence threshold configurable via sidebar slider
-                    confidence_threshold = st.sidebar.slider("Relation Confidence Threshold", 0.0, 1.0, 0.5, 0.05)
-                    graph_builder.add_relations(relations, confidence_threshold=confidence_threshold)
-
-                    # Get data for visualization and metrics
-                    st.session_state['node_data'] = graph_builder.get_node_data()
-                    st.session_state['edge_data'] = graph_builder.get_edge_data()
-
-                    # Prepare nodes and edges for agraph
-                    st.session_state['nodes'], st.session_state['edges'] = prepare_agraph_nodes_edges(
-                         st.session_state['node_data'], st.session_state['edge_data']
-                    )
-
-                    # Calculate metrics
-                    num_entities = len(st.session_state['nodes'])
-                    num_relations = len(st.session_state['edges'])
-                    density = 0.0
-                    # Ensure graph object is retrieved for density calculation
-                    actual_graph = graph_builder.get_graph()
-                    if actual_graph and actual_graph.number_of_nodes() > 1:
-                         density = round(nx.density(actual_graph), 4)
-
-                    st.session_state['graph_metrics'] = {
-                         "num_entities": num_entities,
-                         "num_relations": num_relations,
-                         "density": density
-                    }
+                    # All relations are kept; the view filters only decide what is shown
+                    graph_builder.apply_filters(min_confidence=confidence_threshold, entity_types=entity_types,
+                                                min_count=min_count, min_weight=min_weight)
+                    st.session_state['graph_builder'] = graph_builder
+                    update_graph_view(graph_builder)
 
                 st.success("Knowledge graph built successfully!")
 
@@ -220,13 +277,24 @@ def main():
             st.session_state['text_content'] = None
 
 
+    # --- View Filters ---
+    # Re-apply the sidebar filters to the stored graph when they changed (no NLP involved)
+    graph_builder = st.session_state['graph_builder']
+    if graph_builder is not None and st.session_state['graph_built']:
+        view_filters = {"min_confidence": confidence_threshold, "entity_types": set(entity_types) or None,
+                        "min_count": min_count, "min_weight": min_weight}
+        if view_filters != graph_builder.filters:
+            graph_builder.apply_filters(min_confidence=confidence_threshold, entity_types=entity_types,
+                                        min_count=min_count, min_weight=min_weight)
+            update_graph_view(graph_builder)
+
     # --- Display Section ---
     # Display graph and tables if data exists in session state
 
     st.write("---") # Separator
     st.header("Knowledge Graph Visualization & Data")
 
-    if not st.session_state.get('graph_built', False) and not st.session_state.get('text_content', None):
+    if not st.session_state.get('graph_built', False):
          st.info("Please select a data source and process it using the sidebar controls to build and view the knowledge graph.")
     elif not st.session_state.get('nodes', []) and not st.session_state.get('edges', []):
          st.warning("The graph is empty. No entities or relations were found in the processed text, or processing failed.")
@@ -270,6 +338,12 @@ def main():
             else:
                 st.info("No relationship data available.")
 
+            st.subheader("Relationships by Predicate")
+            if st.session_state['predicate_data']:
+                st.dataframe(pd.DataFrame(st.session_state['predicate_data']))
+            else:
+                st.info("No relationship data available.")
+
     # --- Graph Analytics Section ---
     st.write("---") # Separator
     st.header("Graph Analytics")
@@ -287,5 +361,6 @@ def main():
 if __name__ == "__main__":
     # Note: It's generally recommended to have spacy model downloaded outside the script run
     # E.g., run `python -m spacy download en_core_web_lg` in your terminal once.
+    # Profiles whose model is missing fall back to en_core_web_sm (see EntityRelationExtractor).
     # You could add a check here, but it might slow down startup.
     main()
@@ -0,0 +1,75 @@
+"""Compare extractor profiles on throughput and output overlap with the "accurate" profile
+
+Usage (from the repository root):
+    python -m benchmarks.bench_extractor_profiles document.txt [more.txt ...]
+    python -m benchmarks.bench_extractor_profiles --repeat-sample 200
+
+Profile models that are not installed fall back to en_core_web_sm (see
+EntityRelationExtractor), in which case the profiles differ only in chunking and batching.
+"""
+import argparse
+import time
+
+from src.nlp_processing.extractor import PROFILES, EntityRelationExtractor
+
+SAMPLE_TEXT = (
+    "Marie Curie was born in Warsaw and moved to Paris in 1891. "
+    "She studied physics at the University of Paris, where she met Pierre Curie. "
+    "The Curies discovered polonium and radium in 1898. "
+    "In 1903 the Royal Swedish Academy of Sciences awarded them the Nobel Prize in Physics.\n\n"
+)
+
+
+def _jaccard(a, b):
+    a, b = set(a), set(b)
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _entity_keys(entities):
+    return [(e["text"], e["label"], e["start"]) for e in entities]
+
+
+def _relation_keys(relations):
+    return [(r["subject"], r["predicate"], r["object"]) for r in relations]
+
+
+def run(text, profiles):
+    print(f"{len(text):,} characters")
+    results = {}
+    for profile in profiles:
+        extractor = EntityRelationExtractor(profile=profile)  # model loading is not timed
+        start = time.perf_counter()
+        entities, relations = extractor.extract(text)
+        elapsed = time.perf_counter() - start
+        results[profile] = (elapsed, entities, relations)
+
+    _, ref_entities, ref_relations = results.get("accurate", next(iter(results.values())))
+    print(f"  {'profile':<10} {'seconds':>8} {'chars/s':>10} {'entities':>9} {'relations':>10} {'ent overlap':>12} {'rel overlap':>12}")
+    for profile, (elapsed, entities, relations) in results.items():
+        print(f"  {profile:<10} {elapsed:8.2f} {len(text) / elapsed:10,.0f} {len(entities):9} {len(relations):10} "
+              f"{_jaccard(_entity_keys(entities), _entity_keys(ref_entities)):12.1%} "
+              f"{_jaccard(_relation_keys(relations), _relation_keys(ref_relations)):12.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", help="Text files to benchmark")
+    parser.add_argument("--repeat-sample", type=int, default=100, help="Copies of the built-in sample text when no files are given")
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES))
+    args = parser.parse_args()
+
+    if args.files:
+        texts = []
+        for path in args.files:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                texts.append(f.read())
+        text = "\n\n".join(texts)
+    else:
+        text = SAMPLE_TEXT * args.repeat_sample
+    run(text, args.profiles)
+
+
+if __name__ == "__main__":
+    main()
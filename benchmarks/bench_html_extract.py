@@ -0,0 +1,146 @@
+"""Benchmark the lxml HTML extractor against the original BeautifulSoup implementation
+
+Usage (from the repository root):
+    python -m benchmarks.bench_html_extract page1.html page2.html ...
+    python -m benchmarks.bench_html_extract --synthetic 200
+
+Reports parse time per mode and how many pages produce byte-identical text to the
+BeautifulSoup/html.parser reference, then compares both on ENCODING_CASES
+(non-ASCII pages without <meta charset>) and MALFORMED_CASES (broken markup).
+"""
+import argparse
+import time
+
+from bs4 import BeautifulSoup
+
+from src.data_ingestion.html_extract import extract_main_text, extract_main_texts
+
+
+def extract_text_bs4(content):
+    """Reference: the extraction logic scrape_url used before the lxml extractor"""
+    soup = BeautifulSoup(content, 'html.parser')
+    main_content = soup.find('main') or soup.find('article') or soup.find('div', role='main')
+    if main_content:
+        paragraphs = main_content.find_all(['p'])
+    else:
+        paragraphs = soup.find_all(['p'])
+    text = "\n".join([p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True)])
+    if text.strip():
+        return text.strip()
+    body_text = soup.body.get_text(separator='\n', strip=True) if soup.body else None
+    return body_text.strip() if body_text else None
+
+
+# Broken markup that the two parsers repair differently (see extract_main_text)
+MALFORMED_CASES = {
+    "block element inside <p>": b"<html><body><p>Intro <div>block</div> tail</p></body></html>",
+    "table inside <p>": b"<html><body><p>A<table><tr><td>cell</td></tr></table>B</p></body></html>",
+    "list inside <p>": b"<html><body><p>Items:<ul><li>x</li></ul></p></body></html>",
+    "unclosed <p> tags": b"<html><body><p>One<p>Two<div>Three</div></body></html>",
+    "stray closing tag": b"<html><body><p>Hello</b> world</p></body></html>",
+    "unclosed inline in <main>": b"<html><body><main><p>in <b>main</p></main><p>out</p></body></html>",
+    "fragment without <body>": b"<p>Just a fragment</p>",
+}
+
+
+# Non-ASCII pages that declare no charset in the markup (servers often send it only
+# in the Content-Type header, which neither extractor sees here)
+ENCODING_CASES = {
+    "UTF-8 without meta charset": "<html><body><p>Café in Zürich — naïve</p></body></html>".encode("utf-8"),
+    "UTF-8 with BOM": b"\xef\xbb\xbf" + "<html><body><p>Łódź, 東京</p></body></html>".encode("utf-8"),
+    "windows-1252 without meta": "<html><body><p>Café “quoted” naïve</p></body></html>".encode("cp1252"),
+    "Latin-1 with meta charset": "<html><head><meta charset='iso-8859-1'></head><body><p>Señor Müller</p></body></html>".encode("latin-1"),
+}
+
+
+def compare_cases(title, cases):
+    """Print the bs4 and lxml output for each case; returns the number that differ"""
+    differing = 0
+    print(f"{title} (bs4 html.parser vs lxml):")
+    for name, content in cases.items():
+        ref, out = extract_text_bs4(content), extract_main_text(content)
+        status = "same" if ref == out else "DIFFERENT"
+        differing += ref != out
+        print(f"  {name:<28} {status:<9} bs4={ref!r} lxml={out!r}")
+    print(f"  {differing}/{len(cases)} cases differ")
+    return differing
+
+
+def compare_malformed(cases=MALFORMED_CASES):
+    return compare_cases("Malformed markup", cases)
+
+
+def compare_encodings(cases=ENCODING_CASES):
+    return compare_cases("Encodings", cases)
+
+
+def synthetic_page(i, paragraphs=200):
+    """Build a page with navigation, footer and a long article body"""
+    nav = "".join(f'<li><a href="/s{j}">Section {j}</a></li>' for j in range(30))
+    body = "".join(
+        f"<p>Paragraph {j} of page {i}: <b>Marie Curie</b> worked at the "
+        f"<a href='/u'>Université de Paris</a> in 1903 and studied radioactivity — naïvely at first.</p>"
+        for j in range(paragraphs)
+    )
+    return (
+        f"<html><head><title>Page {i}</title><script>var x = {i};</script>"
+        f"<style>p {{ color: red; }}</style></head><body>"
+        f"<nav><ul>{nav}</ul></nav><div class='content'>{body}</div>"
+        f"<footer><p>Copyright 2024. <a href='/privacy'>Privacy</a></p></footer>"
+        f"</body></html>"
+    ).encode("utf-8")
+
+
+def _timed(fn, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run(pages, repeat=3, max_workers=None):
+    total_mb = sum(len(p) for p in pages) / 1e6
+    print(f"{len(pages)} pages, {total_mb:.2f} MB of HTML, best of {repeat}")
+
+    t_bs4, ref = _timed(lambda: [extract_text_bs4(p) for p in pages], repeat)
+    t_lxml, out = _timed(lambda: [extract_main_text(p) for p in pages], repeat)
+    t_pool, pooled = _timed(lambda: extract_main_texts(pages, max_workers=max_workers), repeat)
+    t_bp, stripped = _timed(lambda: [extract_main_text(p, strip_boilerplate=True) for p in pages], repeat)
+
+    for name, elapsed in (("bs4 html.parser", t_bs4), ("lxml single-pass", t_lxml),
+                          ("lxml process pool", t_pool), ("lxml + boilerplate", t_bp)):
+        print(f"  {name:<20} {elapsed:8.3f}s  {total_mb / elapsed:8.2f} MB/s  x{t_bs4 / elapsed:.1f}")
+
+    matches = sum(1 for a, b in zip(ref, out) if a == b)
+    print(f"  identical to bs4 output: {matches}/{len(pages)} (pool identical to single-pass: {pooled == out})")
+    ref_chars = sum(len(t or "") for t in ref)
+    bp_chars = sum(len(t or "") for t in stripped)
+    if ref_chars:
+        print(f"  boilerplate stripping kept {bp_chars / ref_chars:.1%} of the characters")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", help="HTML files to benchmark")
+    parser.add_argument("--synthetic", type=int, default=0, help="Number of generated pages")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    pages = []
+    for path in args.files:
+        with open(path, "rb") as f:
+            pages.append(f.read())
+    pages.extend(synthetic_page(i) for i in range(args.synthetic))
+    if not pages:
+        pages = [synthetic_page(i) for i in range(100)]
+    run(pages, repeat=args.repeat, max_workers=args.workers)
+    compare_encodings()
+    compare_malformed()
+
+
+if __name__ == "__main__":
+    main()
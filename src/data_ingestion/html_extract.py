@@ -0,0 +1,213 @@
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Optional
+
+import lxml.html
+from bs4 import BeautifulSoup
+from bs4.dammit import EncodingDetector, UnicodeDammit
+from lxml import etree
+
+# --- lxml based HTML-to-text extraction (replaces the BeautifulSoup html.parser path) ---
+
+# Text inside these tags is never visible page text (BeautifulSoup's get_text skips them too)
+_SKIP_TAGS = {"script", "style", "template"}
+
+# Containers whose paragraphs are treated as boilerplate when strip_boilerplate=True
+_BOILERPLATE_TAGS = {"nav", "header", "footer", "aside", "form"}
+_BOILERPLATE_ATTR_RE = re.compile(
+    r"(^|[\s_-])(nav|navbar|menu|footer|header|sidebar|cookie|banner|share|social|promo|advert|ads|comments?|breadcrumbs?|subscribe|newsletter)($|[\s_-])",
+    re.IGNORECASE,
+)
+_MAX_LINK_DENSITY = 0.5
+
+# lxml refuses str input that still carries an XML encoding declaration
+_XML_DECLARATION_RE = re.compile(r"^\s*<\?xml[^>]*\?>")
+
+# One parser per process. Comments stay in the tree (removing them would merge the
+# text around them); _iter_strings skips their content.
+_PARSER = lxml.html.HTMLParser()
+
+
+def decode_html(content, encoding=None) -> str:
+    """Decode raw HTML bytes to str before parsing
+
+    Tried in order: encoding (the charset of the HTTP Content-Type header), a byte
+    order mark or <meta charset>, strict UTF-8, then BeautifulSoup's UnicodeDammit
+    guess. libxml2 would otherwise read pages without <meta charset> as Latin-1.
+    """
+    if isinstance(content, str):
+        return content
+    content, bom_encoding = EncodingDetector.strip_byte_order_mark(content)
+    declared = bom_encoding or EncodingDetector.find_declared_encoding(content, is_html=True)
+    for candidate in (encoding, declared, "utf-8"):
+        if not candidate:
+            continue
+        try:
+            return content.decode(candidate)
+        except (LookupError, UnicodeDecodeError):
+            continue
+    return UnicodeDammit(content, is_html=True).unicode_markup
+
+
+def _iter_strings(element):
+    """Yield the text fragments of an element in document order, skipping comments and script/style content"""
+    skip_depth = 0
+    for event, el in etree.iterwalk(element, events=("start", "end", "comment", "pi")):
+        if event == "start":
+            if el.tag in _SKIP_TAGS:
+                skip_depth += 1
+            elif skip_depth == 0 and el.text:
+                yield el.text
+            continue
+        if event == "end" and el.tag in _SKIP_TAGS:
+            skip_depth -= 1
+        # Comments and processing instructions only contribute their tail text
+        if el is not element and skip_depth == 0 and el.tail:
+            yield el.tail
+
+
+def _get_text(element, separator=""):
+    """Equivalent of BeautifulSoup's Tag.get_text(separator, strip=True)"""
+    return separator.join(s for s in (frag.strip() for frag in _iter_strings(element)) if s)
+
+
+def _is_boilerplate(paragraph, text, scope) -> bool:
+    """Heuristic check for navigation, footer and link-list paragraphs
+
+    Only ancestors below scope (the main content element, or <body>) are checked:
+    page-wide classes such as WordPress's `has-sidebar` on <body> say nothing
+    about a single paragraph.
+    """
+    for ancestor in paragraph.iterancestors():
+        if ancestor is scope or ancestor.tag in ("body", "html"):
+            break
+        if ancestor.tag in _BOILERPLATE_TAGS:
+            return True
+        attrs = f"{ancestor.get('class', '')} {ancestor.get('id', '')}"
+        if attrs.strip() and _BOILERPLATE_ATTR_RE.search(attrs):
+            return True
+    if text:
+        link_chars = sum(len(_get_text(a)) for a in paragraph.iter("a"))
+        if link_chars / len(text) > _MAX_LINK_DENSITY:
+            return True
+    return False
+
+
+def _find_main_content(root, strip_boilerplate=False):
+    """Locate the main content element, or None to fall back to the whole document"""
+    for path in (".//main", ".//article", ".//div[@role='main']"):
+        main_content = root.find(path)
+        if main_content is not None:
+            return main_content
+    if not strip_boilerplate:
+        return None
+
+    # No semantic container: score each paragraph's parent (and, at half weight, its
+    # grandparent) by the amount of paragraph text it holds and keep the best one
+    scores = {}
+    for paragraph in root.iter("p"):
+        length = len(_get_text(paragraph))
+        if not length:
+            continue
+        parent = paragraph.getparent()
+        if parent is None:
+            continue
+        scores[parent] = scores.get(parent, 0) + length
+        grandparent = parent.getparent()
+        if grandparent is not None:
+            scores[grandparent] = scores.get(grandparent, 0) + length / 2
+    if not scores:
+        return None
+    return max(scores, key=scores.get)
+
+
+def _extract_with_html_parser(content) -> Optional[str]:
+    """The original BeautifulSoup/html.parser extraction, used for pages lxml would split"""
+    soup = BeautifulSoup(content, 'html.parser')
+    main_content = soup.find('main') or soup.find('article') or soup.find('div', role='main')
+    paragraphs = (main_content or soup).find_all(['p'])
+    text = "\n".join([p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True)])
+    if text.strip():
+        return text.strip()
+    body_text = soup.body.get_text(separator='\n', strip=True) if soup.body else None
+    return body_text.strip() if body_text else None
+
+
+def _has_split_paragraph() -> bool:
+    """True when the last parse met a </p> with no open <p>: a block element inside the
+    paragraph closed it early, and its text would end up outside every <p>"""
+    return any(error.message.startswith("Unexpected end tag : p") for error in _PARSER.error_log)
+
+
+def extract_main_text(content, strip_boilerplate=False) -> Optional[str]:
+    """Extract readable text from HTML (str, or bytes decoded with decode_html)
+
+    With strip_boilerplate=False this follows the original BeautifulSoup logic: the
+    <p> text of <main>/<article>/<div role="main"> (or of the whole page), falling
+    back to the body text. lxml repairs broken markup the way browsers do: a block
+    element inside <p> (<div>, <table>, <ul>, ...) closes the paragraph and leaves
+    its text outside any <p>. Pages where that happened are handed to the original
+    html.parser path so no text is lost. Remaining differences are listed in
+    benchmarks/bench_html_extract.py: unclosed <p> tags end at the next <p> or block
+    element, as in browsers, instead of nesting and repeating their text in every
+    enclosing paragraph, and text around stray end tags keeps its spacing.
+
+    With strip_boilerplate=True navigation, footer and link-heavy paragraphs are
+    dropped and a content container is guessed when the page has no semantic main
+    element; split paragraphs are not repaired in that mode.
+    """
+    if not content:
+        return None
+    content = _XML_DECLARATION_RE.sub("", decode_html(content), count=1)
+    try:
+        root = lxml.html.document_fromstring(content, parser=_PARSER)
+    except (etree.ParserError, ValueError) as e:
+        print(f"Error while parsing HTML: {e}")
+        return None
+    if not strip_boilerplate and _has_split_paragraph():
+        return _extract_with_html_parser(content)
+
+    main_content = _find_main_content(root, strip_boilerplate=strip_boilerplate)
+    scope = main_content if main_content is not None else root
+
+    texts = []
+    for paragraph in scope.iter("p"):
+        text = _get_text(paragraph)
+        if not text:
+            continue
+        if strip_boilerplate and _is_boilerplate(paragraph, text, scope):
+            continue
+        texts.append(text)
+    text = "\n".join(texts).strip()
+    if text:
+        return text
+
+    # If no <p> tags worked, use all text from body
+    body = root.find("body")
+    if body is None:
+        return None
+    body_text = _get_text(body, separator="\n").strip()
+    return body_text or None
+
+
+def _extract_main_text_worker(args):
+    """Top-level wrapper so extract_main_text can be pickled into worker processes"""
+    content, strip_boilerplate = args
+    try:
+        return extract_main_text(content, strip_boilerplate=strip_boilerplate)
+    except Exception as e:
+        print(f"Error while extracting text in worker: {e}")
+        return None
+
+
+def extract_main_texts(contents: Iterable, strip_boilerplate=False, max_workers=None, chunksize=4) -> List[Optional[str]]:
+    """Extract text from many HTML documents, parsing them in a process pool
+
+    Results are returned in input order. max_workers=1 (or a single document)
+    runs in-process and avoids the pool start-up cost.
+    """
+    jobs = [(content, strip_boilerplate) for content in contents]
+    if max_workers == 1 or len(jobs) <= 1:
+        return [_extract_main_text_worker(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_extract_main_text_worker, jobs, chunksize=chunksize))
@@ -1,6 +1,5 @@
 import os
 import requests
-from bs4 import BeautifulSoup
 from PyPDF2 import PdfReader # PdfReader is the correct class name
 import docx
 from selenium import webdriver
@@ -8,6 +7,13 @@ from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 import time
 import io # Needed for handling file objects
+import json
+import tarfile
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from src.data_ingestion.html_extract import decode_html, extract_main_text, extract_main_texts
 
 # --- Functions modified to accept file-like objects ---
 
@@ -40,8 +46,8 @@ def read_pdf(file_object, filename="Unknown"):
         # Optionally re-raise or handle specific exceptions like PasswordRequiredError
         if "PasswordRequiredError" in str(e):
              print(f"PDF file {filename} is password protected.")
-             # You might want to return a specific message or raise it
-             return f"Error: PDF file {filename} is password protected."
+             # Re-raised so callers report it as an error instead of taking it for the text
+             raise
         return None
 
 def read_docx(file_object, filename="Unknown"):
@@ -90,30 +96,190 @@ def read_txt(file_object, filename="Unknown"):
 # --- New function to handle Streamlit's UploadedFile ---
 
 def process_uploaded_file(uploaded_file):
-    """Process Streamlit UploadedFile object based on its name's extension"""
+    """Process Streamlit UploadedFile object based on its name's extension
+
+    Returns the text or an error message; read_document keeps the two apart.
+    """
     file_name = uploaded_file.name
     _, extension = os.path.splitext(file_name)
     print(f"Processing uploaded file: {file_name} with extension {extension}") # Debugging
+    if archive_kind(file_name):
+        # Joining every document of an archive would exceed nlp.max_length; they are read one at a time
+        return f"Error: '{file_name}' is an archive; read its documents with iter_uploaded_documents."
+    text, error = read_document(uploaded_file, file_name)
+    return error or text
+
+def read_document(file_object, file_name):
+    """Read a .pdf/.docx/.txt file object; returns (text, error message), one of them None
+
+    The error is kept apart from the text, so a document that itself starts with
+    "Error" is not mistaken for a failure.
+    """
+    _, extension = os.path.splitext(file_name)
     try:
         # Use BytesIO to wrap the bytes buffer if needed by a library,
         # but many libraries (like PdfReader, docx.Document) handle the file-like object directly.
-        # file_object = io.BytesIO(uploaded_file.getvalue()) # Use getvalue() for bytes
-        # Pass the uploaded_file object directly, as it's already file-like
-        file_object = uploaded_file
-
+        # Pass the file object directly, as it's already file-like
         if extension.lower() == '.pdf':
-            return read_pdf(file_object, filename=file_name)
+            text = read_pdf(file_object, filename=file_name)
         elif extension.lower() == '.docx':
-            return read_docx(file_object, filename=file_name)
+            text = read_docx(file_object, filename=file_name)
         elif extension.lower() == '.txt':
-            return read_txt(file_object, filename=file_name)
+            text = read_txt(file_object, filename=file_name)
         else:
             print(f"Unsupported file type: {extension}")
             # Return an error message to be displayed in Streamlit
-            return f"Error: Unsupported file type '{extension}' for file '{file_name}'."
+            return None, f"Error: Unsupported file type '{extension}' for file '{file_name}'."
     except Exception as e:
         print(f"Error while processing uploaded file {file_name}: {e}")
-        return f"Error processing file {file_name}: {e}" # Return error message
+        return None, f"Error processing file {file_name}: {e}"
+    if text is None:
+        return None, f"Error: Could not read '{file_name}'."
+    return text, None
+
+# --- Streaming archive and bulk (JSONL) ingestion ---
+
+SUPPORTED_DOCUMENT_EXTENSIONS = ('.pdf', '.docx', '.txt')
+MAX_MEMBER_BYTES = 100 * 1024 * 1024  # Larger archive members are skipped
+# Corrupt, truncated or encrypted data; raised while reading a member or advancing the archive
+ARCHIVE_READ_ERRORS = (zipfile.BadZipFile, tarfile.TarError, zlib.error, EOFError, OSError, RuntimeError)
+
+def archive_kind(file_name):
+    """Return 'zip', 'tar' or 'jsonl' for bulk-upload file names, else None"""
+    name = file_name.lower()
+    if name.endswith('.zip'):
+        return 'zip'
+    if name.endswith(('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')):
+        return 'tar'
+    if name.endswith('.jsonl'):
+        return 'jsonl'
+    return None
+
+def _is_hidden_member(name):
+    """Skip OS metadata entries such as __MACOSX/, .DS_Store and ._resource forks
+
+    '.' and '..' path parts are ignored, so members of archives made with
+    `tar -C dir .` (named './a.txt') are not treated as hidden.
+    """
+    parts = [part for part in name.replace('\\', '/').split('/') if part not in ('', '.', '..')]
+    return any(part.startswith('.') or part == '__MACOSX' for part in parts)
+
+def _read_zip_member(archive, info, size):
+    with archive.open(info) as member:
+        return member.read(size)
+
+def _iter_zip_members(file_object):
+    """Yield (name, read) for zip members; read(size) decompresses the member lazily"""
+    with zipfile.ZipFile(file_object) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or _is_hidden_member(info.filename):
+                continue
+            yield info.filename, lambda size, info=info: _read_zip_member(archive, info, size)
+
+def _iter_tar_members(file_object):
+    """Yield (name, read) for tar members in streaming mode (no seeking, any compression)"""
+    # Each member must be read before the next one is requested
+    with tarfile.open(fileobj=file_object, mode='r|*') as archive:
+        for member in archive:
+            if not member.isfile() or _is_hidden_member(member.name):
+                continue
+            yield member.name, archive.extractfile(member).read
+
+def _iter_jsonl_texts(file_object, filename):
+    """Yield (name, text, error) per JSONL line; a line is a JSON string or an object with a 'text' field"""
+    for line_number, line in enumerate(file_object, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        name = f"line {line_number}"  # Record ids, when present, replace this
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield name, None, f"Error: Invalid JSON on line {line_number} of {filename}: {e}"
+            continue
+        if isinstance(record, dict):
+            name = str(record.get('id', name))
+            record = record.get('text')
+        if isinstance(record, str) and record.strip():
+            yield name, record.strip(), None
+        else:
+            yield name, None, f"Error: No text field on line {line_number} of {filename}."
+
+def _decode_member(name, data):
+    """Run the reader matching a member's extension on its bytes (executed in worker processes)"""
+    return read_document(io.BytesIO(data), name)
+
+def iter_archive_texts(file_object, filename, max_workers=None, max_in_flight=None):
+    """Yield (member name, text, error message) for every document in a zip/tar/JSONL upload
+
+    Members are streamed from the archive one at a time and decoded in a process
+    pool. At most max_in_flight members are held in memory at once, so archive size
+    does not bound memory use. Results come back in archive order.
+
+    Exactly one of text and error is None. A member that cannot be read is
+    reported as its own error. If the archive
+    itself breaks off, the documents read so far are still yielded, followed by
+    one error for the archive.
+    """
+    kind = archive_kind(filename)
+    if kind == 'jsonl':
+        yield from _iter_jsonl_texts(file_object, filename)
+        return
+    members = _iter_zip_members(file_object) if kind == 'zip' else _iter_tar_members(file_object)
+    max_workers = max_workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * max_workers
+
+    executor = ProcessPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+    pending = deque()  # (name, future or ready result) in archive order
+    try:
+        for name, read in members:
+            extension = os.path.splitext(name)[1].lower()
+            if extension not in SUPPORTED_DOCUMENT_EXTENSIONS:
+                pending.append((name, (None, f"Error: Unsupported file type '{extension}' for file '{name}'.")))
+            else:
+                pending.append((name, _read_and_submit(executor, name, read, filename)))
+            while len(pending) >= max_in_flight:
+                yield _pop_result(pending)
+        while pending:
+            yield _pop_result(pending)
+    except ARCHIVE_READ_ERRORS as e:
+        print(f"Error while reading archive {filename}: {e}")
+        while pending:
+            yield _pop_result(pending)
+        yield filename, None, f"Error: Could not read archive '{filename}': {e}"
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+def _read_and_submit(executor, name, read, filename):
+    """Read one member and start decoding it; returns a future or a ready (text, error)"""
+    try:
+        data = read(MAX_MEMBER_BYTES + 1)
+    except ARCHIVE_READ_ERRORS as e:
+        print(f"Error while reading {name} from archive {filename}: {e}")
+        return None, f"Error: Could not read '{name}' from archive '{filename}': {e}"
+    if len(data) > MAX_MEMBER_BYTES:
+        return None, f"Error: File '{name}' is larger than {MAX_MEMBER_BYTES} bytes."
+    if executor is None:
+        return _decode_member(name, data)
+    return executor.submit(_decode_member, name, data)
+
+def _pop_result(pending):
+    name, result = pending.popleft()
+    if isinstance(result, tuple):
+        return (name, *result)
+    try:
+        return (name, *result.result())
+    except Exception as e:
+        return name, None, f"Error processing file {name}: {e}"
+
+def iter_uploaded_documents(uploaded_file, max_workers=None):
+    """Yield (document name, text, error message) for a single upload or each document of an archive"""
+    if archive_kind(uploaded_file.name):
+        yield from iter_archive_texts(uploaded_file, uploaded_file.name, max_workers=max_workers)
+    else:
+        print(f"Processing uploaded file: {uploaded_file.name}") # Debugging
+        yield (uploaded_file.name, *read_document(uploaded_file, uploaded_file.name))
 
 # --- Original file processing function (optional, commented out if unused) ---
 # def process_file(file_path):
@@ -142,48 +308,53 @@ def process_uploaded_file(uploaded_file):
 
 # --- URL Scraping Functions (Unchanged from original logic, added error prints) ---
 
-def scrape_url(url):
-    """Scrape content from URL using requests/BeautifulSoup"""
+def fetch_url(url):
+    """Fetch a page from URL as decoded HTML text, or None on failure"""
     try:
         print(f"Fetching URL: {url}") # Debugging statement
         headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
         response = requests.get(url, timeout=20, headers=headers) # Increased timeout, added user-agent
         print(f"Response Status Code: {response.status_code}") # چاپ کد وضعیت
-
         response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
+        # Only trust the header charset when it is given explicitly (requests defaults text/* to Latin-1)
+        charset = response.encoding if 'charset' in response.headers.get('Content-Type', '').lower() else None
+        return decode_html(response.content, charset)
+    except requests.exceptions.RequestException as e:
+        print(f"Error during requests to {url}: {e}")
+        return None
 
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        # Try to find main content areas first, fallback to paragraphs
-        main_content = soup.find('main') or soup.find('article') or soup.find('div', role='main')
-        if main_content:
-             paragraphs = main_content.find_all(['p']) # Focus on <p> within main content
-        else:
-             paragraphs = soup.find_all(['p']) # Fallback to all <p> tags
-
-        text = "\n".join([p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True)])
+def scrape_url(url):
+    """Scrape content from URL using requests and the lxml text extractor"""
+    content = fetch_url(url)
+    if content is None:
+        return None
+    try:
+        # lxml-based extraction: <p> text of the main content area, falling back to body text
+        text = extract_main_text(content)
 
-        if text.strip(): # Check if any text was actually extracted
+        if text:
             print(f"Scraped URL Text (First 500 chars): {text[:500]}")
-            return text.strip()
+            return text
         else:
-            # If no <p> tags worked, try getting all text from body
-            print("Warning: No text found in <p> tags. Trying body text.")
-            body_text = soup.body.get_text(separator='\n', strip=True) if soup.body else None
-            if body_text:
-                 print(f"Scraped Body Text (First 500 chars): {body_text[:500]}")
-                 return body_text.strip()
-            else:
-                print("Error: No meaningful text could be scraped from the URL.")
-                return None # Explicitly return None if scraping fails
+            print("Error: No meaningful text could be scraped from the URL.")
+            return None # Explicitly return None if scraping fails
 
-    except requests.exceptions.RequestException as e:
-        print(f"Error during requests to {url}: {e}")
-        return None
     except Exception as e:
         print(f"Error while scraping URL {url}: {e}")
         return None
 
+def scrape_urls(urls, max_workers=None, strip_boilerplate=False):
+    """Scrape several URLs: fetch sequentially, then parse the pages in a process pool
+
+    Returns a list of texts (None for pages that failed) in the order of urls.
+    """
+    pages = [fetch_url(url) for url in urls]
+    texts = extract_main_texts(pages, strip_boilerplate=strip_boilerplate, max_workers=max_workers)
+    for url, text in zip(urls, texts):
+        if not text:
+            print(f"Error: No meaningful text could be scraped from {url}.")
+    return texts
+
 def scrape_url_with_selenium(url):
     """Scrape content from URL using Selenium (for JavaScript-heavy websites)"""
     # Important: Requires chromedriver to be installed and accessible.
@@ -0,0 +1,444 @@
+"""Durable, resumable ingestion queue backed by SQLite
+
+Tasks (files, URLs or raw text) are enqueued once and leased by any number of
+worker processes. A worker runs ingestion plus entity/relation extraction and
+checkpoints the result in the same database, so a crash only loses the tasks that
+were in flight; their leases expire and they are handed out again.
+
+Usage (from the repository root):
+    python -m src.data_ingestion.work_queue queue.db enqueue --file docs/*.pdf dump.zip --url https://example.com
+    python -m src.data_ingestion.work_queue queue.db work --workers 4
+    python -m src.data_ingestion.work_queue queue.db status
+
+Several hosts can share one queue file on a shared volume, but SQLite's file
+locking must work there (local disks and most SMB mounts do; some NFS setups do
+not). The rollback journal is used instead of WAL for that reason.
+
+Archives (zip/tar/JSONL) are expanded when they are enqueued: every document
+becomes its own "member" task named "<archive path>:<member name>", with its text
+stored in task_texts, so a worker never holds a whole archive's text and results
+trace back to the member. Members whose text is already queued are skipped.
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+TASK_KINDS = ("file", "url", "text", "member")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    source TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    available_at REAL NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (kind, source)
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, available_at);
+CREATE TABLE IF NOT EXISTS task_texts (
+    task_id INTEGER PRIMARY KEY REFERENCES tasks (id),
+    text_hash BLOB NOT NULL UNIQUE,
+    text TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    task_id INTEGER PRIMARY KEY REFERENCES tasks (id),
+    worker TEXT NOT NULL,
+    text_chars INTEGER NOT NULL,
+    entities TEXT NOT NULL,
+    relations TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL NOT NULL
+);
+"""
+
+
+class IngestionQueue:
+    def __init__(self, path: str, lease_seconds: float = 600.0, max_attempts: int = 3, retry_delay: float = 30.0):
+        """Open (or create) a queue database
+
+        lease_seconds: how long a leased task stays reserved without a heartbeat
+        max_attempts: leases per task before it is marked failed
+        retry_delay: base delay before a failed task is retried (doubles per attempt)
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        # isolation_level=None: transactions are managed explicitly with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, timeout=60.0, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA busy_timeout = 60000")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction that takes the database lock up front"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    # --- Producers ---
+
+    def enqueue(self, kind: str, source: str) -> Optional[int]:
+        """Add a task; returns its id, or None if the same (kind, source) is already queued"""
+        ids = self.enqueue_many([(kind, source)])
+        return ids[0] if ids else None
+
+    def enqueue_many(self, tasks: Iterable[Tuple[str, str]]) -> List[int]:
+        """Add several (kind, source) tasks in one transaction; already queued ones are skipped"""
+        from src.data_ingestion.ingest import archive_kind
+
+        now = time.time()
+        ids = []
+        with self._transaction() as conn:
+            for kind, source in tasks:
+                if kind not in TASK_KINDS:
+                    raise ValueError(f"Unknown task kind '{kind}'. Choose from {', '.join(TASK_KINDS)}.")
+                if kind == "member":
+                    raise ValueError("Member tasks carry their text; add them with enqueue_archive.")
+                if kind == "file":
+                    if archive_kind(source):
+                        raise ValueError(f"'{source}' is an archive; enqueue it with enqueue_archive.")
+                    source = os.path.abspath(source)
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO tasks (kind, source, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                    (kind, source, now, now))
+                if cursor.rowcount:
+                    ids.append(cursor.lastrowid)
+        return ids
+
+    def enqueue_archive(self, path: str, batch_size: int = 100) -> Tuple[List[int], List[str]]:
+        """Enqueue every document of a zip/tar/JSONL file as its own member task
+
+        Documents are decoded while the archive streams and committed batch_size at a
+        time, so only one batch of text is held in memory. Members that cannot be
+        read are recorded as failed tasks. Returns the new task ids and an error
+        message per unreadable member.
+        """
+        from src.data_ingestion.ingest import iter_archive_texts
+
+        path = os.path.abspath(path)
+        ids, errors, batch = [], [], []
+        with open(path, "rb") as f:
+            for name, text, error in iter_archive_texts(f, os.path.basename(path)):
+                if error is None and not text:
+                    error = "No text could be extracted."
+                if error is not None:
+                    errors.append(f"{name}: {error}")
+                batch.append((f"{path}:{name}", text, error))
+                if len(batch) >= batch_size:
+                    ids.extend(self._enqueue_members(batch))
+                    batch = []
+        ids.extend(self._enqueue_members(batch))
+        return ids, errors
+
+    def _enqueue_members(self, members: Iterable[Tuple[str, Optional[str], Optional[str]]]) -> List[int]:
+        """Add (source, text, error) archive members in one transaction; returns the new pending task ids"""
+        now = time.time()
+        ids = []
+        with self._transaction() as conn:
+            for source, text, error in members:
+                if error is None:
+                    text_hash = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+                    if conn.execute("SELECT 1 FROM task_texts WHERE text_hash = ?", (text_hash,)).fetchone():
+                        continue  # The same text is already queued from another member
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO tasks (kind, source, status, error, created_at, updated_at) "
+                    "VALUES ('member', ?, ?, ?, ?, ?)",
+                    (source, "pending" if error is None else "failed", error, now, now))
+                if not cursor.rowcount or error is not None:
+                    continue
+                conn.execute("INSERT INTO task_texts (task_id, text_hash, text) VALUES (?, ?, ?)",
+                             (cursor.lastrowid, text_hash, text))
+                ids.append(cursor.lastrowid)
+        return ids
+
+    # --- Workers ---
+
+    def lease(self, worker: str, limit: int = 1) -> List[Dict]:
+        """Reserve up to limit tasks that are pending or whose lease expired"""
+        now = time.time()
+        with self._transaction() as conn:
+            # Expired leases that used up their attempts are given up on
+            conn.execute(
+                "UPDATE tasks SET status = 'failed', lease_owner = NULL, updated_at = ?, "
+                "error = COALESCE(error, 'lease expired') "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts))
+            rows = conn.execute(
+                "SELECT id, kind, source, attempts, task_texts.text AS text FROM tasks "
+                "LEFT JOIN task_texts ON task_texts.task_id = tasks.id "
+                "WHERE (status = 'pending' AND available_at <= ?) OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY id LIMIT ?",
+                (now, now, limit)).fetchall()
+            for row in rows:
+                conn.execute(
+                    "UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                    "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (worker, now + self.lease_seconds, now, row["id"]))
+        return [dict(row, attempts=row["attempts"] + 1) for row in rows]
+
+    def heartbeat(self, task_id: int, worker: str) -> bool:
+        """Extend a lease; False means the lease was lost (expired and taken by another worker)"""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET lease_expires = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (now + self.lease_seconds, now, task_id, worker))
+        return cursor.rowcount == 1
+
+    def complete(self, task_id: int, worker: str, text_chars: int, entities: List[Dict],
+                 relations: List[Dict], started_at: float) -> bool:
+        """Checkpoint a task's extraction result and mark it done (only by the lease holder)"""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = 'done', lease_owner = NULL, error = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (now, task_id, worker))
+            if cursor.rowcount != 1:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO results (task_id, worker, text_chars, entities, relations, started_at, finished_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (task_id, worker, text_chars, json.dumps(entities), json.dumps(relations), started_at, now))
+        return True
+
+    def fail(self, task_id: int, worker: str, error: str) -> None:
+        """Record a failure; the task is retried after a backoff until max_attempts is reached"""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT attempts FROM tasks WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                               (task_id, worker)).fetchone()
+            if row is None:
+                return
+            if row["attempts"] >= self.max_attempts:
+                status, available_at = "failed", now
+            else:
+                status, available_at = "pending", now + self.retry_delay * 2 ** (row["attempts"] - 1)
+            conn.execute(
+                "UPDATE tasks SET status = ?, lease_owner = NULL, available_at = ?, error = ?, updated_at = ? "
+                "WHERE id = ?",
+                (status, available_at, error, now, task_id))
+
+    # --- Reporting ---
+
+    def progress(self, window_seconds: float = 60.0) -> Dict:
+        """Task counts by status plus overall and recent throughput (tasks and characters per second)"""
+        now = time.time()
+        counts = {status: 0 for status in ("pending", "leased", "done", "failed")}
+        for row in self.conn.execute("SELECT status, COUNT(*) AS n FROM tasks GROUP BY status"):
+            counts[row["status"]] = row["n"]
+        totals = self.conn.execute(
+            "SELECT COUNT(*) AS n, COALESCE(SUM(text_chars), 0) AS chars, MIN(started_at) AS first, "
+            "MAX(finished_at) AS last FROM results").fetchone()
+        recent = self.conn.execute(
+            "SELECT COUNT(*) AS n, COALESCE(SUM(text_chars), 0) AS chars FROM results WHERE finished_at >= ?",
+            (now - window_seconds,)).fetchone()
+        workers = self.conn.execute(
+            "SELECT COUNT(DISTINCT lease_owner) AS n FROM tasks WHERE status = 'leased' AND lease_expires >= ?",
+            (now,)).fetchone()["n"]
+
+        elapsed = (totals["last"] - totals["first"]) if totals["n"] else 0.0
+        tasks_per_second = totals["n"] / elapsed if elapsed > 0 else 0.0
+        recent_rate = recent["n"] / window_seconds
+        remaining = counts["pending"] + counts["leased"]
+        rate = recent_rate or tasks_per_second
+        return {
+            **counts,
+            "total": sum(counts.values()),
+            "active_workers": workers,
+            "chars_processed": totals["chars"],
+            "tasks_per_second": tasks_per_second,
+            "recent_tasks_per_second": recent_rate,
+            "recent_chars_per_second": recent["chars"] / window_seconds,
+            "eta_seconds": remaining / rate if rate else None,
+        }
+
+    def failures(self) -> List[Dict]:
+        return [dict(row) for row in self.conn.execute(
+            "SELECT id, kind, source, attempts, error FROM tasks WHERE status = 'failed' ORDER BY id")]
+
+    def iter_results(self, with_source: bool = False):
+        """Yield (entities, relations), or (source, entities, relations), for every completed task in task order"""
+        for row in self.conn.execute(
+                "SELECT source, entities, relations FROM results JOIN tasks ON tasks.id = results.task_id "
+                "ORDER BY task_id"):
+            if with_source:
+                yield row["source"], json.loads(row["entities"]), json.loads(row["relations"])
+            else:
+                yield json.loads(row["entities"]), json.loads(row["relations"])
+
+    def load_into_builder(self, graph_builder, confidence_threshold: float = 0.5) -> None:
+        """Add all checkpointed results to a KnowledgeGraphBuilder, one task at a time"""
+        for entities, relations in self.iter_results():
+            graph_builder.add_extraction(entities, relations)
+        graph_builder.apply_filters(min_confidence=confidence_threshold)
+
+
+# --- Worker processes ---
+
+def _ingest(task: Dict) -> Tuple[Optional[str], Optional[str]]:
+    """Turn a task into text with the regular ingestion functions; returns (text, error message)"""
+    from src.data_ingestion.ingest import read_document, scrape_url
+
+    if task["kind"] == "file":
+        with open(task["source"], "rb") as f:
+            return read_document(f, task["source"])
+    if task["kind"] == "url":
+        return scrape_url(task["source"]), None
+    if task["kind"] == "member":
+        return task["text"], None
+    return task["source"], None
+
+
+@contextmanager
+def _keep_lease(queue: IngestionQueue, task_id: int, worker: str):
+    """Renew a lease from a background thread while the task runs
+
+    Yields an Event that is set once the lease is lost. The thread uses its own
+    connection because sqlite3 connections cannot be shared across threads.
+    """
+    lost, done = threading.Event(), threading.Event()
+
+    def renew():
+        renewer = IngestionQueue(queue.path, lease_seconds=queue.lease_seconds,
+                                 max_attempts=queue.max_attempts, retry_delay=queue.retry_delay)
+        try:
+            while not done.wait(queue.lease_seconds / 3):
+                if not renewer.heartbeat(task_id, worker):
+                    lost.set()
+                    break
+        finally:
+            renewer.close()
+
+    thread = threading.Thread(target=renew, name=f"lease-{task_id}", daemon=True)
+    thread.start()
+    try:
+        yield lost
+    finally:
+        done.set()
+        thread.join()
+
+
+def run_worker(queue_path: str, worker: Optional[str] = None, profile: str = "fast",
+               exit_when_idle: bool = True, poll_interval: float = 5.0, **queue_options) -> int:
+    """Lease and process tasks until the queue is drained; returns the number of tasks completed"""
+    from src.nlp_processing.extractor import EntityRelationExtractor
+
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    queue = IngestionQueue(queue_path, **queue_options)
+    extractor = EntityRelationExtractor(profile=profile)
+    completed = 0
+    try:
+        while True:
+            tasks = queue.lease(worker)
+            if not tasks:
+                counts = queue.progress()
+                # Leased tasks may still come back if their worker dies, so wait for them too
+                if exit_when_idle and counts["pending"] == 0 and counts["leased"] == 0:
+                    break
+                time.sleep(poll_interval)
+                continue
+            task = tasks[0]
+            started_at = time.time()
+            try:
+                with _keep_lease(queue, task["id"], worker) as lease_lost:
+                    text, error = _ingest(task)
+                    if error is not None or not text:
+                        queue.fail(task["id"], worker, error or "No text could be extracted.")
+                        continue
+                    if lease_lost.is_set():
+                        print(f"Warning: Lease on task {task['id']} was lost; skipping it.")
+                        continue
+                    entities, relations = extractor.extract(text)
+                # complete() also checks the lease, so a lease lost during extraction is not recorded twice
+                if queue.complete(task["id"], worker, len(text), entities, relations, started_at):
+                    completed += 1
+            except Exception as e:
+                print(f"Error while processing task {task['id']} ({task['kind']}: {task['source'][:100]}): {e}")
+                queue.fail(task["id"], worker, str(e))
+    finally:
+        queue.close()
+    return completed
+
+
+def run_workers(queue_path: str, num_workers: int, **worker_options) -> None:
+    """Run num_workers worker processes on this host and wait for them to finish"""
+    processes = [multiprocessing.Process(target=run_worker, args=(queue_path,), kwargs=worker_options)
+                 for _ in range(num_workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Durable ingestion queue")
+    parser.add_argument("queue", help="Path to the SQLite queue file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="Add files, URLs or text to the queue")
+    enqueue.add_argument("--file", nargs="*", default=[],
+                         help="Document paths (.pdf, .docx, .txt) or archives (.zip, .tar, .tar.gz, .jsonl), one task per document")
+    enqueue.add_argument("--url", nargs="*", default=[], help="URLs to scrape")
+    enqueue.add_argument("--text", nargs="*", default=[], help="Raw text")
+
+    work = commands.add_parser("work", help="Process tasks until the queue is drained")
+    work.add_argument("--workers", type=int, default=1)
+    work.add_argument("--profile", default="fast", help="Extraction profile (see extractor.PROFILES)")
+    work.add_argument("--lease-seconds", type=float, default=600.0)
+    work.add_argument("--max-attempts", type=int, default=3)
+
+    commands.add_parser("status", help="Show progress and throughput")
+    args = parser.parse_args()
+
+    if args.command == "enqueue":
+        from src.data_ingestion.ingest import archive_kind
+
+        queue = IngestionQueue(args.queue)
+        archives = [path for path in args.file if archive_kind(path)]
+        tasks = ([("file", path) for path in args.file if not archive_kind(path)] + [("url", url) for url in args.url]
+                 + [("text", text) for text in args.text])
+        ids = queue.enqueue_many(tasks)
+        print(f"Enqueued {len(ids)} new tasks ({len(tasks) - len(ids)} already queued).")
+        for path in archives:
+            ids, errors = queue.enqueue_archive(path)
+            print(f"Enqueued {len(ids)} new tasks from {path} ({len(errors)} unreadable documents).")
+            for error in errors:
+                print(f"  {error}")
+    elif args.command == "work":
+        run_workers(args.queue, args.workers, profile=args.profile,
+                    lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
+        print(json.dumps(IngestionQueue(args.queue).progress(), indent=2))
+    else:
+        queue = IngestionQueue(args.queue)
+        print(json.dumps(queue.progress(), indent=2))
+        for failure in queue.failures():
+            print(f"Failed task {failure['id']} ({failure['kind']}: {failure['source'][:100]}): {failure['error']}")
+
+
+if __name__ == "__main__":
+    main()
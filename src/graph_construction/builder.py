@@ -1,106 +1,433 @@
+import sys
+from array import array
+from collections import defaultdict
 import networkx as nx
-from typing import List, Dict
+import numpy as np
+from typing import List, Dict, Optional, Iterable
+
+class SymbolTable:
+    """Interns strings as small integers, so repeated labels/types/predicates are stored once
+
+    The graph holds the table's own string objects (via lookup), so every node or
+    edge sharing a label/type/predicate points to one string.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.symbols = []
+
+    def intern(self, symbol: str) -> int:
+        symbol_id = self.ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = self.ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return symbol_id
+
+    def lookup(self, symbol_id: int) -> str:
+        return self.symbols[symbol_id]
+
+    def __len__(self) -> int:
+        return len(self.symbols)
 
 class KnowledgeGraphBuilder:
     def __init__(self):
-        """Initialize an empty knowledge graph"""
-        self.graph = nx.DiGraph()
-        
+        """Initialize an empty knowledge graph
+
+        Entities and relations are stored in flat arrays: every node gets a row, and
+        labels, types and predicates are ids into the labels, types and predicates
+        symbol tables. Only the shown part of the graph carries strings: nodes have
+        label/type/count, edges have predicate/weight/confidence and are keyed by
+        predicate, so every predicate between a pair of entities keeps its own edge.
+        """
+        self.graph = nx.MultiDiGraph()
+        self.labels = SymbolTable()
+        self.types = SymbolTable()
+        self.predicates = SymbolTable()
+        # Every entity/relation is kept, so view filters can be re-applied without re-running NLP
+        self._node_rows = {}                # node id -> row in the arrays below
+        self._node_ids = []                 # row -> node id
+        self._entity_labels = array("i")    # row -> label id
+        self._entity_types = array("i")     # row -> type id
+        self._entity_counts = array("i")    # row -> mention count, 0 for relation-only nodes
+        # Relation-only row -> [(confidence, label id, type id), ...] in insertion order, keeping
+        # only mentions more confident than all earlier ones (the others can never be shown)
+        self._mentions = {}
+        # Per relation: subject row, object row, predicate id and confidence. Relations with
+        # the same subject, object and predicate are grouped into one edge by _build_index
+        self._relation_subjects = array("i")
+        self._relation_objects = array("i")
+        self._relation_predicates = array("i")
+        self._relation_confidences = array("d")
+        self._edge_index = None     # built lazily, see _build_index
+        self._applied_filters = None  # filters the graph currently reflects
+        # Node ids and edge keys changed since the last pop_changes, or None after a full rebuild
+        self._changes = None
+        self.filters = {"min_confidence": 0.5, "entity_types": None, "min_count": 1, "min_weight": 1}
+
+    def _intern_node(self, node_id: str) -> int:
+        row = self._node_rows.get(node_id)
+        if row is None:
+            row = self._node_rows[node_id] = len(self._node_ids)
+            self._node_ids.append(node_id)
+            self._entity_labels.append(0)
+            self._entity_types.append(0)
+            self._entity_counts.append(0)
+        return row
+
     def add_entities(self, entities: List[Dict]) -> None:
         """Add entities to the knowledge graph"""
-        for entity in entities:  # این خط باید تو رفته باشد
-            entity_id = self._normalize_text(entity["text"])
-            if not self.graph.has_node(entity_id):
-                self.graph.add_node(
-                    entity_id,
-                    label=entity["text"],
-                    type=entity["label"],
-                    count=1
-                )
-            else:
-                # Update count for existing entity
-                self.graph.nodes[entity_id]["count"] += 1
-    
+        self._store_entities(entities)
+        self.apply_filters()
+
     def add_relations(self, relations: List[Dict], confidence_threshold: float = 0.5) -> None:
-        """Add relations to the knowledge graph with confidence threshold"""
+        """Add relations to the knowledge graph with confidence threshold
+
+        All relations are stored; the threshold only decides which are shown and can
+        be changed later with apply_filters.
+        """
+        self._store_relations(relations)
+        self.apply_filters(min_confidence=confidence_threshold)
+
+    def add_extraction(self, entities: List[Dict], relations: List[Dict]) -> None:
+        """Store one document's entities and relations without updating the graph
+
+        For streaming many documents in: the graph is rebuilt once, by the next
+        apply_filters call, instead of after every document.
+        """
+        self._store_entities(entities)
+        self._store_relations(relations)
+
+    def _store_entities(self, entities: List[Dict]) -> None:
+        for entity in entities:  # این خط باید تو رفته باشد
+            row = self._intern_node(self._normalize_text(entity["text"]))
+            if self._entity_counts[row] == 0:
+                self._entity_labels[row] = self.labels.intern(entity["text"])
+                self._entity_types[row] = self.types.intern(entity["label"])
+                self._mentions.pop(row, None)  # An entity's own label/type always win
+            # Update count for existing entity
+            self._entity_counts[row] += 1
+        if entities:
+            self._applied_filters = None  # New nodes need a full rebuild
+
+    def _store_relations(self, relations: List[Dict]) -> None:
         for relation in relations:  # این خط باید تو رفته باشد
-            if relation["confidence"] < confidence_threshold:
-                continue
-                
             subject_id = self._normalize_text(relation["subject"])
             object_id = self._normalize_text(relation["object"])
-            
-            # Ensure nodes exist
-            if not self.graph.has_node(subject_id):
-                self.graph.add_node(
-                    subject_id,
-                    label=relation["subject"],
-                    type=relation["subject_type"],
-                    count=1
-                )
-                
-            if not self.graph.has_node(object_id):
-                self.graph.add_node(
-                    object_id,
-                    label=relation["object"],
-                    type=relation["object_type"],
-                    count=1
-                )
-            
-            # Add or update edge
-            if self.graph.has_edge(subject_id, object_id):
-                self.graph[subject_id][object_id]["weight"] += 1
-                current_conf = self.graph[subject_id][object_id]["confidence"]
-                count = self.graph[subject_id][object_id]["weight"]
-                new_conf = (current_conf * (count - 1) + relation["confidence"]) / count
-                self.graph[subject_id][object_id]["confidence"] = new_conf
+            confidence = relation["confidence"]
+
+            subject_row = self._intern_node(subject_id)
+            object_row = self._intern_node(object_id)
+            self._add_mention(subject_row, confidence, relation["subject"], relation["subject_type"])
+            self._add_mention(object_row, confidence, relation["object"], relation["object_type"])
+            self._relation_subjects.append(subject_row)
+            self._relation_objects.append(object_row)
+            self._relation_predicates.append(self.predicates.intern(relation["predicate"]))
+            self._relation_confidences.append(confidence)
+        if relations:
+            self._edge_index = None
+
+    def _add_mention(self, row: int, confidence: float, label: str, type_: str) -> None:
+        if self._entity_counts[row]:
+            return
+        mentions = self._mentions.get(row)
+        if mentions is None:
+            self._mentions[row] = [(confidence, self.labels.intern(label), self.types.intern(type_))]
+        elif confidence > mentions[-1][0]:
+            mentions.append((confidence, self.labels.intern(label), self.types.intern(type_)))
+
+    def _build_index(self) -> None:
+        """Build the confidence indexes used by apply_filters
+
+        - one edge per distinct (subject, object, predicate), with the confidences of its
+          relations sorted and their running sums, so the weight and mean confidence
+          above any threshold take one search per edge (or a few array operations for
+          all edges at once)
+        - edges sorted by their highest confidence, so a full rebuild skips edges with no
+          relation above the threshold
+        - every relation sorted by confidence, so moving the threshold only revisits the
+          edges that have a relation between the old and new value
+        """
+        subjects = np.array(self._relation_subjects, dtype=np.int32)
+        objects = np.array(self._relation_objects, dtype=np.int32)
+        predicates = np.array(self._relation_predicates, dtype=np.int32)
+        confidences = np.array(self._relation_confidences, dtype=np.float64)
+        order = np.lexsort((confidences, predicates, objects, subjects))
+        subjects, objects, predicates, confidences = subjects[order], objects[order], predicates[order], confidences[order]
+        new_edge = np.ones(len(order), dtype=bool)
+        new_edge[1:] = (subjects[1:] != subjects[:-1]) | (objects[1:] != objects[:-1]) | (predicates[1:] != predicates[:-1])
+        starts = np.append(np.flatnonzero(new_edge), len(order))
+        edges = np.cumsum(new_edge) - 1  # edge of each (sorted) relation
+        max_confidences = confidences[starts[1:] - 1]
+        by_max_confidence = np.argsort(max_confidences, kind="stable")
+        by_confidence = np.argsort(confidences, kind="stable")
+        self._edge_index = {
+            "subjects": subjects[starts[:-1]],
+            "objects": objects[starts[:-1]],
+            "predicates": predicates[starts[:-1]],
+            "confidences": confidences,
+            "starts": starts,
+            "sums": np.concatenate(([0.0], np.cumsum(confidences))),
+            "max_confidences": max_confidences[by_max_confidence],
+            "max_confidence_edges": by_max_confidence,
+            "relation_confidences": confidences[by_confidence],
+            "relation_edges": edges[by_confidence],
+        }
+        self._applied_filters = None
+
+    def _edge_attributes(self, edge: int, min_confidence: float, min_weight: int) -> Optional[Dict]:
+        """Aggregate weight/confidence of an edge over its relations >= min_confidence"""
+        index = self._edge_index
+        start, end = index["starts"][edge], index["starts"][edge + 1]
+        first = start + index["confidences"][start:end].searchsorted(min_confidence)
+        weight = int(end - first)
+        if weight == 0 or weight < min_weight:
+            return None
+        return self._edge_dict(self.predicates.lookup(index["predicates"][edge]), weight,
+                               index["sums"][end] - index["sums"][first], index["confidences"][first])
+
+    def _edge_key(self, edge: int):
+        """(subject id, object id, predicate) of an edge, as keyed in the graph"""
+        index = self._edge_index
+        return (self._node_ids[index["subjects"][edge]], self._node_ids[index["objects"][edge]],
+                self.predicates.lookup(index["predicates"][edge]))
+
+    def _edge_dict(self, predicate: str, weight: int, confidence_sum: float, lowest: float) -> Dict:
+        return {
+            "predicate": predicate,
+            "weight": weight,
+            # A single relation keeps its exact confidence rather than a difference of running sums
+            "confidence": float(lowest if weight == 1 else confidence_sum / weight)
+        }
+
+    def _node_symbols(self, row: int, min_confidence: float):
+        """(label id, type id, count) of a node under the given confidence threshold"""
+        count = self._entity_counts[row]
+        if count:
+            return self._entity_labels[row], self._entity_types[row], count
+        # Nodes created by relations take the label/type of the first relation that is shown
+        mentions = self._mentions[row]
+        _, label, type_ = next((m for m in mentions if m[0] >= min_confidence), mentions[0])
+        return label, type_, 1
+
+    def _node_attributes(self, row: int, min_confidence: float) -> Dict:
+        label, type_, count = self._node_symbols(row, min_confidence)
+        return {"label": self.labels.lookup(label), "type": self.types.lookup(type_), "count": count}
+
+    def _node_passes(self, symbols) -> bool:
+        _, type_, count = symbols
+        types = self.filters["entity_types"]
+        return count >= self.filters["min_count"] and (
+            types is None or self.types.lookup(type_) in types)
+
+    def apply_filters(self, min_confidence: Optional[float] = None, entity_types: Optional[Iterable[str]] = None,
+                      min_count: Optional[int] = None, min_weight: Optional[int] = None) -> None:
+        """Update the graph to the given view filters without re-extracting anything
+
+        Arguments left as None keep their current value; pass entity_types=[] to clear a
+        type filter. When only min_confidence changes (and no type filter is set), just
+        the edges with a relation between the old and new threshold, and their end
+        nodes, are updated.
+        """
+        if min_confidence is not None:
+            self.filters["min_confidence"] = min_confidence
+        if entity_types is not None:
+            self.filters["entity_types"] = set(entity_types) or None
+        if min_count is not None:
+            self.filters["min_count"] = min_count
+        if min_weight is not None:
+            self.filters["min_weight"] = min_weight
+        if self._edge_index is None:
+            self._build_index()
+
+        applied = self._applied_filters
+        # With a type filter, moving the threshold can retype relation-only nodes and so
+        # hide/show edges that have no relation near the threshold: rebuild in that case
+        if applied is not None and self.filters["entity_types"] is None and all(
+                applied[name] == value for name, value in self.filters.items() if name != "min_confidence"):
+            self._update_confidence(applied["min_confidence"], self.filters["min_confidence"])
+        else:
+            self._rebuild_graph()
+        self._applied_filters = dict(self.filters)
+
+    def _rebuild_graph(self) -> None:
+        """Recreate every node and edge of the graph from the stored entities/relations"""
+        threshold = self.filters["min_confidence"]
+        min_weight = max(self.filters["min_weight"], 1)
+        index = self._edge_index
+
+        # Per edge, the relations >= threshold are the tail of its sorted confidences
+        first_above = np.searchsorted(index["max_confidences"], threshold)
+        candidates = np.sort(index["max_confidence_edges"][first_above:])
+        starts, ends = index["starts"][candidates], index["starts"][candidates + 1]
+        below = np.cumsum(np.concatenate(([0], index["confidences"] < threshold)))
+        firsts = starts + (below[ends] - below[starts])
+        weights = ends - firsts
+        shown = weights >= min_weight
+        candidates, firsts, ends, weights = candidates[shown], firsts[shown], ends[shown], weights[shown]
+        sums = index["sums"][ends] - index["sums"][firsts]
+        lowest = index["confidences"][firsts]
+
+        passes = {}  # row -> whether the node passes the type/count filters
+
+        def node_passes(row):
+            if row not in passes:
+                passes[row] = self._node_passes(self._node_symbols(row, threshold))
+            return passes[row]
+
+        edges = [edge for edge in zip(index["subjects"][candidates].tolist(), index["objects"][candidates].tolist(),
+                                      index["predicates"][candidates].tolist(), weights.tolist(), sums.tolist(),
+                                      lowest.tolist())
+                 if node_passes(edge[0]) and node_passes(edge[1])]
+        # Relation-only nodes are shown only together with one of their edges
+        linked = {row for edge in edges for row in edge[:2]}
+        rows = [row for row, count in enumerate(self._entity_counts)
+                if count and (row in linked or node_passes(row))]
+        rows.extend(row for row in linked if not self._entity_counts[row])
+
+        self.graph.clear()
+        self.graph.add_nodes_from((self._node_ids[row], self._node_attributes(row, threshold)) for row in rows)
+        for subject, object_, predicate, weight, confidence_sum, low in edges:
+            predicate = self.predicates.lookup(predicate)
+            self.graph.add_edge(self._node_ids[subject], self._node_ids[object_], key=predicate,
+                                **self._edge_dict(predicate, weight, confidence_sum, low))
+        self._changes = None
+
+    def _update_confidence(self, old_threshold: float, new_threshold: float) -> None:
+        """Incrementally move the confidence threshold, touching only the affected edges"""
+        index = self._edge_index
+        low, high = sorted((old_threshold, new_threshold))
+        # A relation changes visibility exactly when low <= confidence < high
+        first, last = index["relation_confidences"].searchsorted((low, high))
+        affected = np.unique(index["relation_edges"][first:last]).tolist()
+
+        touched_nodes = set()
+        touched_edges = set()
+        for edge in affected:
+            subject_id, object_id, predicate = self._edge_key(edge)
+            touched_nodes.update((subject_id, object_id))
+            touched_edges.add((subject_id, object_id, predicate))
+            attrs = self._edge_attributes(edge, new_threshold, self.filters["min_weight"])
+            if attrs is not None:
+                rows = [self._node_rows[node_id] for node_id in (subject_id, object_id)]
+                if all(self._node_passes(self._node_symbols(row, new_threshold)) for row in rows):
+                    for row in rows:
+                        if not self.graph.has_node(self._node_ids[row]):
+                            self.graph.add_node(self._node_ids[row], **self._node_attributes(row, new_threshold))
+                    self.graph.add_edge(subject_id, object_id, key=predicate, **attrs)
+                    continue
+            if self.graph.has_edge(subject_id, object_id, predicate):
+                self.graph.remove_edge(subject_id, object_id, predicate)
+
+        # Relation-only nodes follow their edges: relabel them or drop them once isolated
+        for node_id in touched_nodes:
+            row = self._node_rows[node_id]
+            if self._entity_counts[row] or not self.graph.has_node(node_id):
+                continue
+            if self.graph.degree(node_id) == 0:
+                self.graph.remove_node(node_id)
             else:
-                self.graph.add_edge(
-                    subject_id,
-                    object_id,
-                    predicate=relation["predicate"],
-                    weight=1,
-                    confidence=relation["confidence"]
-                )
-    
-    def get_graph(self) -> nx.DiGraph:
-        """Return the knowledge graph"""
+                self.graph.nodes[node_id].update(self._node_attributes(row, new_threshold))
+        if self._changes is not None:
+            self._changes[0].update(touched_nodes)
+            self._changes[1].update(touched_edges)
+
+    def pop_changes(self):
+        """Return (node ids, edge keys) changed since the last call, or None if the graph was rebuilt
+
+        Edge keys are (subject, object, predicate) as in the graph. Lets views update
+        only the rows that changed after an incremental apply_filters.
+        """
+        changes, self._changes = self._changes, (set(), set())
+        return changes
+
+    def get_entity_types(self) -> List[str]:
+        """Return every entity type seen, regardless of the active filters"""
+        return sorted(self.types.symbols)
+
+    def get_predicate_summary(self) -> List[Dict]:
+        """Aggregate the shown edges per predicate: edge count, total weight and mean confidence"""
+        edges = defaultdict(int)
+        weights = defaultdict(int)
+        confidence_sums = defaultdict(float)
+        for _, _, predicate, data in self.graph.edges(keys=True, data=True):
+            edges[predicate] += 1
+            weights[predicate] += data["weight"]
+            confidence_sums[predicate] += data["confidence"] * data["weight"]
+        summary = [{
+            "predicate": predicate,
+            "edges": edges[predicate],
+            "weight": weights[predicate],
+            "confidence": confidence_sums[predicate] / weights[predicate]
+        } for predicate in edges]
+        return sorted(summary, key=lambda row: row["weight"], reverse=True)
+
+    def get_graph(self) -> nx.MultiDiGraph:
+        """Return the knowledge graph (one edge per subject, object and predicate)"""
         return self.graph
-    
+
     def get_node_data(self) -> List[Dict]:
         """Get node data for visualization"""
         nodes = []
         for node, data in self.graph.nodes(data=True):  # این خط باید تو رفته باشد
-            nodes.append({
-                "id": node,
-                "label": data.get("label", node),
-                "type": data.get("type", "Unknown"),
-                "count": data.get("count", 1)
-            })
+            nodes.append(self._node_row(node, data))
         return nodes
-    
+
     def get_edge_data(self) -> List[Dict]:
         """Get edge data for visualization"""
         edges = []
-        for source, target, data in self.graph.edges(data=True):  # این خط باید تو رفته باشد
-            edges.append({
-                "source": source,
-                "target": target,
-                "predicate": data.get("predicate", "related_to"),
-                "weight": data.get("weight", 1),
-                "confidence": data.get("confidence", 0.5)
-            })
+        for source, target, predicate, data in self.graph.edges(keys=True, data=True):  # این خط باید تو رفته باشد
+            edges.append(self._edge_row(source, target, predicate, data))
         return edges
-    
+
+    def get_node_row(self, node_id: str) -> Optional[Dict]:
+        """Visualization row for one node, or None if it is not shown"""
+        if not self.graph.has_node(node_id):
+            return None
+        return self._node_row(node_id, self.graph.nodes[node_id])
+
+    def get_edge_row(self, key) -> Optional[Dict]:
+        """Visualization row for one (subject, object, predicate) edge, or None if it is not shown"""
+        source, target, predicate = key
+        if not self.graph.has_edge(source, target, predicate):
+            return None
+        return self._edge_row(source, target, predicate, self.graph.edges[source, target, predicate])
+
+    def _node_row(self, node, data) -> Dict:
+        return {
+            "id": node,
+            "label": data.get("label", node),
+            "type": data.get("type", "Unknown"),
+            "count": data.get("count", 1)
+        }
+
+    def _edge_row(self, source, target, predicate, data) -> Dict:
+        return {
+            "source": source,
+            "target": target,
+            "predicate": data.get("predicate", predicate),
+            "weight": data.get("weight", 1),
+            "confidence": data.get("confidence", 0.5)
+        }
+
+    def density(self) -> float:
+        """Density over distinct (subject, object) pairs, so parallel predicate edges do not push it above 1"""
+        num_nodes = self.graph.number_of_nodes()
+        if num_nodes < 2:
+            return 0.0
+        # A MultiDiGraph's adjacency maps each node to {neighbour: {predicate: attrs}}
+        pairs = sum(len(neighbours) for _, neighbours in self.graph.adjacency())
+        return pairs / (num_nodes * (num_nodes - 1))
+
     def calculate_metrics(self) -> Dict:
         """Calculate graph metrics"""
         return {
             "num_entities": self.graph.number_of_nodes(),
             "num_relations": self.graph.number_of_edges(),
-            "density": nx.density(self.graph),
+            "density": self.density(),
             "connected_components": nx.number_connected_components(nx.Graph(self.graph))
         }
-    
+
     def _normalize_text(self, text: str) -> str:
         """Normalize text for node IDs"""
-        return text.lower().replace(" ", "_")
\ No newline at end of file
+        # Interned so that every edge key referring to a node shares one string object
+        return sys.intern(text.lower().replace(" ", "_"))
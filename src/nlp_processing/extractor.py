@@ -1,46 +1,257 @@
+import re
 import spacy
 from spacy.tokens import Doc
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
+
+# Speed/accuracy profiles. Only the components extraction needs are loaded:
+# tok2vec + parser (dependencies, sentences) + ner. Relations are read from the
+# dependency parse, so every profile keeps the same components for extract() and
+# the profiles differ in model size, chunking and batching; entity-only runs skip
+# the parser and the shared tok2vec (see _entity_only_disable). chunk_chars splits
+# long input at paragraph/sentence boundaries so it can be streamed through nlp.pipe
+# in batches (None keeps the whole text in one Doc, the original behaviour).
+# chars_per_second is a rough CPU throughput estimate used by the "auto" profile.
+PROFILES = {
+    "fast": {
+        "model": "en_core_web_sm",
+        "batch_size": 64,
+        "n_process": 1,
+        "chunk_chars": 5000,
+        "chars_per_second": 60000,
+    },
+    "balanced": {
+        "model": "en_core_web_md",
+        "batch_size": 32,
+        "n_process": 2,
+        "chunk_chars": 20000,
+        "chars_per_second": 45000,
+    },
+    "accurate": {
+        "model": "en_core_web_lg",
+        "batch_size": 8,
+        "n_process": 1,
+        "chunk_chars": None,
+        "chars_per_second": 30000,
+    },
+}
+FALLBACK_MODEL = "en_core_web_sm"  # The only model shipped in requirements.txt
+UNUSED_COMPONENTS = ["tagger", "attribute_ruler", "lemmatizer", "senter"]
+
+# A paragraph ends at a blank line; PyPDF2 output often has spaces before the newline
+_BLOCK_RE = re.compile(r"\S(?:.*?\S)?(?=[ \t]*\n\s*\n|\s*$)", re.DOTALL)
+_SPACE_RE = re.compile(r"\s+")
+
+
+def _entity_only_disable(nlp) -> List[str]:
+    """Components that can be skipped when only doc.ents is needed
+
+    ner in the en_core_web models embeds its own tok2vec; the shared tok2vec only
+    feeds the tagger and parser, so it is dropped together with the parser.
+    """
+    disable = [name for name in ("parser",) if name in nlp.pipe_names]
+    for name, pipe in nlp.pipeline:
+        listeners = getattr(pipe, "listening_components", None)
+        if listeners is not None and all(listener in disable for listener in listeners):
+            disable.append(name)
+    return disable
+
+
+def choose_profile(text_length: int, target_latency: float) -> str:
+    """Pick the most accurate profile whose estimated run time fits target_latency (seconds)"""
+    for name in ("accurate", "balanced", "fast"):
+        if text_length / PROFILES[name]["chars_per_second"] <= target_latency:
+            return name
+    return "fast"
+
 
 class EntityRelationExtractor:
-    def __init__(self, model="en_core_web_lg"):
-        """Initialize the extractor with a spaCy model"""
-        self.nlp = spacy.load(model)
-        self.nlp.max_length = 2000000  # افزایش حد مجاز طول متن به 2,000,000 کاراکتر
-    
+    def __init__(self, model=None, profile="accurate", target_latency=30.0):
+        """Initialize the extractor with a spaCy model
+
+        profile is one of PROFILES or "auto", which picks a profile per text from its
+        length and target_latency. model overrides the profile's model.
+        """
+        if profile != "auto" and profile not in PROFILES:
+            raise ValueError(f"Unknown profile '{profile}'. Choose from {', '.join(PROFILES)} or 'auto'.")
+        self.profile = profile
+        self.model = model
+        self.target_latency = target_latency
+        self._pipelines = {}
+        self._sentencizer = None
+        # With "auto" the pipeline is loaded lazily per text in _docs
+        self.nlp = None if profile == "auto" else self._get_nlp(profile)
+
+    def _get_nlp(self, profile: str):
+        """Load (once) the pipeline for a profile, falling back to the shipped small model
+
+        Only a profile's default model falls back; an explicit model or a missing
+        FALLBACK_MODEL raises OSError.
+        """
+        model = self.model or PROFILES[profile]["model"]
+        if model not in self._pipelines:
+            try:
+                nlp = spacy.load(model, exclude=UNUSED_COMPONENTS)
+            except OSError:
+                if self.model or model == FALLBACK_MODEL:
+                    raise
+                print(f"Warning: spaCy model '{model}' is not installed. Falling back to '{FALLBACK_MODEL}'.")
+                nlp = spacy.load(FALLBACK_MODEL, exclude=UNUSED_COMPONENTS)
+            nlp.max_length = 2000000  # افزایش حد مجاز طول متن به 2,000,000 کاراکتر
+            self._pipelines[model] = nlp
+        return self._pipelines[model]
+
+    def resolve_profile(self, text: str = "", total_chars: Optional[int] = None) -> str:
+        """Return the profile used for text, or for a batch of total_chars characters"""
+        if self.profile == "auto":
+            return choose_profile(len(text) if total_chars is None else total_chars, self.target_latency)
+        return self.profile
+
+    def _split_sentences(self, text: str, offset: int, chunk_chars: int) -> List[Tuple[int, str]]:
+        """Split an oversized block with the rule-based sentencizer (no model needed)
+
+        Sentences that are still longer than chunk_chars (tables, text without
+        punctuation) are cut at the last whitespace before the limit.
+        """
+        if self._sentencizer is None:
+            self._sentencizer = spacy.blank("en")
+            self._sentencizer.add_pipe("sentencizer")
+        self._sentencizer.max_length = max(self._sentencizer.max_length, len(text) + 1)
+        pieces = []
+        for sent in self._sentencizer(text).sents:
+            start, sentence = sent.start_char, sent.text
+            while len(sentence) > chunk_chars:
+                cut = max((m.start() for m in _SPACE_RE.finditer(sentence, 0, chunk_chars)), default=chunk_chars) or chunk_chars
+                pieces.append((offset + start, sentence[:cut]))
+                skipped = len(sentence[cut:]) - len(sentence[cut:].lstrip())
+                start, sentence = start + cut + skipped, sentence[cut + skipped:]
+            if sentence:
+                pieces.append((offset + start, sentence))
+        return pieces
+
+    def _chunk_text(self, text: str, chunk_chars) -> List[Tuple[int, str]]:
+        """Group paragraphs (and, for huge paragraphs, sentences) into (offset, chunk) pieces of ~chunk_chars"""
+        if not chunk_chars or len(text) <= chunk_chars:
+            return [(0, text)]
+        pieces = []
+        for block in _BLOCK_RE.finditer(text):
+            if len(block.group()) > chunk_chars:
+                pieces.extend(self._split_sentences(block.group(), block.start(), chunk_chars))
+            else:
+                pieces.append((block.start(), block.group()))
+
+        chunks = []
+        start, end = None, None
+        for offset, piece in pieces:
+            if start is not None and offset + len(piece) - start > chunk_chars:
+                chunks.append((start, text[start:end]))
+                start = None
+            if start is None:
+                start = offset
+            end = offset + len(piece)
+        if start is not None:
+            chunks.append((start, text[start:end]))
+        return chunks
+
+    def _pipe(self, texts: Iterable[str], profile: str, need_parser: bool = True, single: bool = False):
+        """Yield (text index, char offset, Doc) for the chunks of every text, in order
+
+        All chunks of all texts go through one nlp.pipe call, so batching and the
+        process pool (n_process) are shared across texts.
+        """
+        settings = PROFILES[profile]
+        nlp = self.nlp if self.nlp is not None else self._get_nlp(profile)
+        disable = [] if need_parser else _entity_only_disable(nlp)
+
+        def chunks():
+            for index, text in enumerate(texts):
+                if len(text) > nlp.max_length and not settings["chunk_chars"]:
+                    print(f"Warning: Text length ({len(text)}) exceeds maximum allowed length ({nlp.max_length}).")
+                for offset, chunk in self._chunk_text(text, settings["chunk_chars"]):
+                    yield chunk, (index, offset)
+
+        if single:
+            # One text: a process pool only pays off when it has several chunks
+            chunk_list = list(chunks())
+            n_process = settings["n_process"] if len(chunk_list) > 1 else 1
+            stream = chunk_list
+        else:
+            n_process, stream = settings["n_process"], chunks()
+        for doc, (index, offset) in nlp.pipe(stream, as_tuples=True, batch_size=settings["batch_size"],
+                                             n_process=n_process, disable=disable):
+            yield index, offset, doc
+
+    def _docs(self, text: str, need_parser: bool = True):
+        """Yield (char offset, Doc) for text, processed in batches with the selected profile"""
+        for _, offset, doc in self._pipe([text], self.resolve_profile(text), need_parser, single=True):
+            yield offset, doc
+
     def extract_entities(self, text: str) -> List[Dict]:
         """Extract entities from text"""
-        if len(text) > self.nlp.max_length:
-            print(f"Warning: Text length ({len(text)}) exceeds maximum allowed length ({self.nlp.max_length}).")
-        
-        doc = self.nlp(text)  # پردازش متن
         entities = []
-        
+        # The dependency parser (and the tok2vec feeding it) is not needed for NER, so it is skipped here
+        for offset, doc in self._docs(text, need_parser=False):
+            entities.extend(self._entities_from_doc(doc, offset))
+        return entities
+
+    def extract_relations(self, text: str) -> List[Dict]:
+        """Extract potential relations between entities"""
+        relations = []
+        for _, doc in self._docs(text):
+            relations.extend(self._relations_from_doc(doc))
+        return relations
+
+    def extract(self, text: str) -> Tuple[List[Dict], List[Dict]]:
+        """Extract entities and relations in a single pass over the text"""
+        entities, relations = [], []
+        for offset, doc in self._docs(text):
+            entities.extend(self._entities_from_doc(doc, offset))
+            relations.extend(self._relations_from_doc(doc))
+        return entities, relations
+
+    def extract_many(self, texts: Iterable[str], total_chars: Optional[int] = None) -> Iterator[Tuple[List[Dict], List[Dict]]]:
+        """Extract (entities, relations) for each of several texts, yielded in input order
+
+        texts may be a lazy iterable; it is consumed as results are yielded. The
+        "auto" profile is chosen once from total_chars (default: the summed length
+        of texts, which must then be a list), not per text. Entity offsets are
+        relative to their own text.
+        """
+        if total_chars is None and self.profile == "auto":
+            texts = list(texts)
+            total_chars = sum(len(text) for text in texts)
+        profile = self.resolve_profile(total_chars=total_chars or 0)
+        current, entities, relations = None, [], []
+        for index, offset, doc in self._pipe(texts, profile):
+            # Every text yields at least one chunk, so indexes arrive without gaps
+            if index != current:
+                if current is not None:
+                    yield entities, relations
+                current, entities, relations = index, [], []
+            entities.extend(self._entities_from_doc(doc, offset))
+            relations.extend(self._relations_from_doc(doc))
+        if current is not None:
+            yield entities, relations
+
+    def _entities_from_doc(self, doc: Doc, offset: int = 0) -> List[Dict]:
+        entities = []
         for ent in doc.ents:
             entities.append({
                 "text": ent.text,
                 "label": ent.label_,
-                "start": ent.start_char,
-                "end": ent.end_char
+                "start": offset + ent.start_char,
+                "end": offset + ent.end_char
             })
-            
         return entities
-    
-    def extract_relations(self, text: str) -> List[Dict]:
-        """Extract potential relations between entities"""
-        if len(text) > self.nlp.max_length:
-            print(f"Warning: Text length ({len(text)}) exceeds maximum allowed length ({self.nlp.max_length}).")
-        
-        doc = self.nlp(text)  # پردازش متن
+
+    def _relations_from_doc(self, doc: Doc) -> List[Dict]:
         relations = []
-        
         # Simple relation extraction based on dependency parsing
         for sent in doc.sents:
             for token in sent:
                 if token.dep_ in ("ROOT", "nsubj"):
                     subject = token.text
                     subject_type = self._get_entity_type(token, doc)
-                    
+
                     for child in token.children:
                         if child.dep_ in ("dobj", "pobj"):
                             object_ = child.text
@@ -54,19 +265,16 @@ class EntityRelationExtractor:
                                 "confidence": 0.7  # Placeholder for actual confidence calculation
                             }
                             relations.append(relation)
-        
         return relations
-    
+
     def _get_entity_type(self, token, doc: Doc) -> str:
         """Get entity type for a token if it's part of a named entity"""
-        for ent in doc.ents:
-            if token.i >= ent.start and token.i < ent.end:
-                return ent.label_
-        return "UNKNOWN"
-    
+        # ent_type_ is set on every token inside doc.ents, so no scan over the entities is needed
+        return token.ent_type_ or "UNKNOWN"
+
     def _get_predicate(self, subject_token, sent) -> str:
         """Extract predicate for a subject token"""
         for token in sent:
             if token.head == subject_token.head and token.dep_ == "ROOT":
                 return token.text
-        return ""
\ No newline at end of file
+        return ""
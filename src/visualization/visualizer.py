@@ -4,31 +4,99 @@ from streamlit_agraph import Node, Edge
 
 def prepare_agraph_nodes_edges(node_data, edge_data):
     """Prepare nodes and edges for streamlit-agraph"""
-    nodes = []
-    edges = []
-    
-    # Create nodes
-    for node in node_data:
-        size = 10 + (node["count"] * 2)  # Size based on count
-        nodes.append(Node(
-            id=node["id"],
-            label=node["label"],
-            size=size,
-            color=get_node_color(node["type"])
-        ))
-    
-    # Create edges
-    for edge in edge_data:
-        edges.append(Edge(
-            source=edge["source"],
-            target=edge["target"],
-            label=edge["predicate"],
-            # Color or width could be based on confidence
-            color=get_edge_color(edge["confidence"])
-        ))
-    
+    nodes = [agraph_node(node) for node in node_data]
+    edges = [agraph_edge(edge) for edge in edge_data]
     return nodes, edges
 
+def agraph_node(node):
+    """streamlit-agraph Node for a node row (see KnowledgeGraphBuilder.get_node_data)"""
+    size = 10 + (node["count"] * 2)  # Size based on count
+    return Node(
+        id=node["id"],
+        label=node["label"],
+        size=size,
+        color=get_node_color(node["type"])
+    )
+
+def agraph_edge(edge):
+    """streamlit-agraph Edge for an edge row (see KnowledgeGraphBuilder.get_edge_data)"""
+    return Edge(
+        source=edge["source"],
+        target=edge["target"],
+        label=edge["predicate"],
+        # Color or width could be based on confidence
+        color=get_edge_color(edge["confidence"])
+    )
+
+class GraphView:
+    """Table rows, agraph objects and per-predicate totals for a builder's graph, kept in sync
+
+    refresh() uses the builder's pop_changes(): after an incremental filter change
+    only the nodes and edges it touched are recomputed; after a rebuild everything is.
+    """
+
+    def __init__(self, graph_builder):
+        self.graph_builder = graph_builder
+        self._reset()
+
+    def _reset(self):
+        self.node_rows = {}    # node id -> row
+        self.edge_rows = {}    # (source, target, predicate) -> row
+        self.nodes = {}        # node id -> agraph Node
+        self.edges = {}        # (source, target, predicate) -> agraph Edge
+        self.predicates = {}   # predicate -> [edges, weight, weight * confidence]
+
+    def refresh(self):
+        changes = self.graph_builder.pop_changes()
+        if changes is None:
+            self._reset()
+            for row in self.graph_builder.get_node_data():
+                self._set_node(row["id"], row)
+            for row in self.graph_builder.get_edge_data():
+                self._set_edge((row["source"], row["target"], row["predicate"]), row)
+            return
+        node_ids, edge_keys = changes
+        for node_id in node_ids:
+            self._set_node(node_id, self.graph_builder.get_node_row(node_id))
+        for key in edge_keys:
+            self._set_edge(key, self.graph_builder.get_edge_row(key))
+
+    def _set_node(self, node_id, row):
+        if row is None:
+            self.node_rows.pop(node_id, None)
+            self.nodes.pop(node_id, None)
+        else:
+            self.node_rows[node_id] = row
+            self.nodes[node_id] = agraph_node(row)
+
+    def _set_edge(self, key, row):
+        old = self.edge_rows.pop(key, None)
+        self.edges.pop(key, None)
+        if old is not None:
+            self._count_predicate(old, -1)
+        if row is not None:
+            self.edge_rows[key] = row
+            self.edges[key] = agraph_edge(row)
+            self._count_predicate(row, 1)
+
+    def _count_predicate(self, row, sign):
+        totals = self.predicates.setdefault(row["predicate"], [0, 0, 0.0])
+        totals[0] += sign
+        totals[1] += sign * row["weight"]
+        totals[2] += sign * row["weight"] * row["confidence"]
+        if totals[0] == 0:
+            del self.predicates[row["predicate"]]
+
+    def predicate_summary(self):
+        """Same rows as KnowledgeGraphBuilder.get_predicate_summary, from the running totals"""
+        summary = [{
+            "predicate": predicate,
+            "edges": edges,
+            "weight": weight,
+            "confidence": confidence_sum / weight
+        } for predicate, (edges, weight, confidence_sum) in self.predicates.items()]
+        return sorted(summary, key=lambda row: row["weight"], reverse=True)
+
 def get_node_color(node_type):
     """Get color based on node type"""
     color_map = {